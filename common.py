@@ -0,0 +1,255 @@
+"""
+Shared helpers for the reviewers and the prompt builder.
+
+Holds the one file extension to language mapping used everywhere, so a
+new language only needs adding here, the prompt template filling, and
+what reviewer.py and reviewer_claude.py share: the Backend protocol,
+file discovery, concurrent directory reviews, output and common CLI
+options.
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Protocol
+
+import review_cache
+
+# File extension (lowercase) to language mapping
+EXTENSION_MAP = {
+    ".cs": "csharp",
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".jsx": "javascript",
+    ".java": "java",
+    ".go": "go",
+    ".rs": "rust",
+    ".cpp": "cpp",
+    ".c": "c",
+    ".rb": "ruby",
+    ".php": "php",
+    ".swift": "swift",
+    ".kt": "kotlin",
+}
+
+
+def detect_language(filepath: Path) -> str:
+    """Detect programming language from file extension."""
+    return EXTENSION_MAP.get(os.path.splitext(filepath)[1].lower(), "unknown")
+
+
+@functools.lru_cache(maxsize=32)
+def split_template(prompt: str) -> tuple[str, Optional[str]]:
+    """Split a prompt template around its {code} field.
+
+    Returns (head, tail), or (prompt, None) when the template has no
+    single {code} field to split at.
+    """
+    head, sep, tail = prompt.partition("{code}")
+    if not sep or head.endswith("{") or "{code" in tail:
+        return prompt, None
+    return head, tail
+
+
+def fill_template(prompt: str, filename: str, language: str, code: str) -> list[str]:
+    """Fill in a prompt template, returning it as [head, code, tail].
+
+    Only the small head and tail go through str.format; the code is
+    passed through as is rather than being copied into the template.
+    """
+    head, tail = split_template(prompt)
+    if tail is None:
+        return [prompt.format(filename=filename, language=language, code=code)]
+    fields = {"filename": filename, "language": language}
+    return [head.format(**fields), code, tail.format(**fields)]
+
+
+class Backend(Protocol):
+    """A model that reviews files, as driven by review_files and the CLIs."""
+
+    def review_file(self, filepath: Path, stream: bool = False) -> dict:
+        """Review one file into a result dict with "file" and "review" or "error".
+
+        With ``stream``, the review is also printed as it is generated.
+        """
+        ...
+
+
+def echo(text: str):
+    """Write streamed review text to stdout straight away."""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def find_files(dirpath: Path, extensions: list[str], recursive: bool = False) -> list[Path]:
+    """List files in a directory matching any of the extensions.
+
+    The tree is walked once however many extensions are given.
+    """
+    suffixes = tuple(ext.lower() for ext in extensions)
+    
+    if recursive:
+        names = (
+            Path(root) / name
+            for root, _, files in os.walk(dirpath)
+            for name in files
+        )
+    else:
+        names = (Path(entry.path) for entry in os.scandir(dirpath))
+    
+    return sorted(
+        filepath for filepath in names
+        if filepath.name.lower().endswith(suffixes) and filepath.is_file()
+    )
+
+
+def review_files(
+    backend: Backend,
+    filepaths: list[Path],
+    concurrency: int,
+    stream: bool = False
+) -> list[dict]:
+    """Review files with backend, up to ``concurrency`` at once.
+
+    Results keep file order. Streaming reviews one file at a time so
+    their output does not interleave.
+    """
+    if stream:
+        concurrency = 1
+    
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        return list(executor.map(lambda filepath: backend.review_file(filepath, stream), filepaths))
+
+
+def print_review(result: dict, output_format: str = "text", streamed: bool = False):
+    """Print review result. A streamed review was already printed, so it is left out."""
+    if output_format == "json":
+        print(json.dumps(result, indent=2))
+        return
+    
+    print("\n" + "=" * 60)
+    print(f"📄 File: {result['file']}")
+    
+    if "error" in result:
+        print(f"❌ Error: {result['error']}")
+    else:
+        print(f"🔤 Language: {result.get('language', 'unknown')}")
+        if result.get("cache") == "semantic":
+            print("♻️  Reused the review of a near-identical file")
+        if not streamed:
+            print("-" * 60)
+            print(result.get("review", "No review generated"))
+    
+    print("=" * 60)
+
+
+def print_results(results: list[dict], output_format: str = "text", streamed: bool = False):
+    """Print a directory's reviews, then how many files were reviewed."""
+    for result in results:
+        print_review(result, output_format, streamed)
+    
+    if output_format != "json":
+        print(f"\n✅ Reviewed {len(results)} file(s)")
+
+
+def add_common_arguments(
+    parser: argparse.ArgumentParser,
+    default_model: str,
+    backend_name: str,
+    default_concurrency: int,
+    concurrency_note: str
+):
+    """Add the options both reviewers take, from path to --stream."""
+    parser.add_argument(
+        "path",
+        type=Path,
+        help="File or directory to review"
+    )
+    
+    parser.add_argument(
+        "-e", "--extensions",
+        nargs="+",
+        default=[".cs", ".py", ".ts", ".js"],
+        help="File extensions to review (default: .cs .py .ts .js)"
+    )
+    
+    parser.add_argument(
+        "-r", "--recursive",
+        action="store_true",
+        help="Review files recursively in directories"
+    )
+    
+    parser.add_argument(
+        "-m", "--model",
+        default=default_model,
+        help=f"{backend_name} model to use (default: {default_model})"
+    )
+    
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Output results as JSON"
+    )
+    
+    parser.add_argument(
+        "--prompt-file",
+        type=Path,
+        help="Custom prompt template file"
+    )
+    
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=default_concurrency,
+        help=f"Files reviewed in parallel (default: {default_concurrency}; {concurrency_note})"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the model instead of reusing cached reviews"
+    )
+    
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=review_cache.DEFAULT_TTL_HOURS,
+        metavar="HOURS",
+        help=f"Reuse cached reviews up to this old (default: {review_cache.DEFAULT_TTL_HOURS})"
+    )
+    
+    parser.add_argument(
+        "--stream",
+        action=argparse.BooleanOptionalAction,
+        help="Print reviews as they are generated (default: on for a single file without --json)"
+    )
+
+
+def apply_common_arguments(args: argparse.Namespace) -> tuple[bool, Optional[str]]:
+    """Act on the common options: configure the cache and load --prompt-file.
+
+    Returns whether to stream and the custom prompt, if any. Streaming
+    output would corrupt --json, so it is off with it.
+    """
+    stream = args.stream
+    if stream is None:
+        stream = args.path.is_file() and not args.json
+    if args.json:
+        stream = False
+    
+    review_cache.configure(enabled=not args.no_cache, ttl_hours=args.cache_ttl)
+    
+    custom_prompt = None
+    if args.prompt_file:
+        if args.prompt_file.exists():
+            custom_prompt = args.prompt_file.read_text()
+        else:
+            print(f"Warning: Prompt file not found: {args.prompt_file}")
+    
+    return stream, custom_prompt
@@ -13,46 +13,150 @@ See README.md for full documentation.
 
 import argparse
 import json
+import logging
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Set, Optional
-from collections import Counter, defaultdict
-
-# Reuse the extension map from reviewer
-EXTENSION_MAP = {
-    ".cs": "csharp",
-    ".py": "python",
-    ".js": "javascript",
-    ".ts": "typescript",
-    ".tsx": "typescript",
-    ".jsx": "javascript",
-    ".java": "java",
-    ".go": "go",
-    ".rs": "rust",
-    ".cpp": "cpp",
-    ".c": "c",
-    ".rb": "ruby",
-    ".php": "php",
-    ".swift": "swift",
-    ".kt": "kotlin",
+from typing import Dict, Iterator, List, Set, Optional, Tuple
+from collections import Counter, defaultdict, deque
+
+from common import EXTENSION_MAP
+
+# Common non-source directories, never descended into by scan_files
+_SKIP_DIRS = frozenset({
+    "node_modules", "venv", ".venv", "env", ".env",
+    "build", "dist", "target", "bin", "obj",
+    ".git", ".svn", "__pycache__", ".pytest_cache"
+})
+
+# Only the head of each file is scanned; conventions show up early and
+# this bounds the time spent on huge vendored or generated sources
+MAX_BYTES_SCANNED = 256 * 1024
+
+# Files skipped by scan_files as generated: anything this large, or with
+# one of these names
+SKIP_FILE_BYTES = 5 * 1024 * 1024
+_GENERATED_NAMES = frozenset({"bundle.js"})
+_GENERATED_SUFFIXES = (".min.js", ".min.mjs", ".min.cjs", ".bundle.js")
+
+# Analysis progress is logged once per this many files
+PROGRESS_EVERY = 1000
+
+# Below this many files a process pool costs more to start than it saves
+PARALLEL_MIN_FILES = 64
+
+# Files opened ahead of the analyzer so the kernel can prefetch them
+READ_AHEAD = 16
+_FADVISE = hasattr(os, 'posix_fadvise')
+
+# Per-file results are cached in the analyzed project between runs. Bump
+# CACHE_VERSION whenever the analyzers change what they record.
+CACHE_FILENAME = ".prompt_builder_cache.json"
+CACHE_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+# Precompiled analyzer patterns, one table per language. Compiling them once
+# at import keeps the per-file loop from going through re's pattern cache.
+# Patterns are bytes so files can be scanned without decoding them first.
+# Where possible they start with a literal keyword: re can then jump between
+# occurrences with a fast substring search instead of trying every offset,
+# which a leading optional group such as (?:pub\s+)? prevents.
+#
+# Only the Python structural patterns are fused into one alternation. They
+# are line-anchored, so every line start is tried anyway and one pass beats
+# four. Keyword-led patterns (Go, Rust, ...) scan faster as separate passes,
+# each driven by its literal prefix, than as one alternation over all offsets.
+_PY_PATTERNS = {
+    # Classes, functions, constants and imports are all anchored at the start
+    # of a line and never overlap, so one alternation finds them in one pass.
+    "structure": re.compile(
+        rb'^(?:class\s+(?P<cls>\w+)'
+        rb'|(?:async\s+)?def\s+(?P<fn>\w+)'
+        rb'|(?P<const>[A-Z_]{2,})\s*='
+        rb'|from\s+(?P<frm>\S+)\s+import'
+        rb'|import\s+(?P<imp>\S+))',
+        re.MULTILINE
+    ),
+    "typehint": re.compile(rb':\s*\w+\s*(?:=|\)|->)'),
 }
 
+# Lowercase keyword -> framework name, matched against lowercased content
+_PY_FRAMEWORKS = {
+    b"fastapi": "FastAPI",
+    b"flask": "Flask",
+    b"django": "Django",
+    b"pytest": "pytest",
+}
+
+_TS_PATTERNS = {
+    "class": re.compile(rb'class\s+(\w+)'),
+    "func": re.compile(rb'(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:async\s*)?\()'),
+    "const": re.compile(rb'const\s+([A-Z_]{2,})\s*='),
+    "private": re.compile(rb'private\s+(\w+):'),
+    "import": re.compile(rb'import\s+.*?\s+from\s+[\'"]([^\'"]+)'),
+}
+
+# Lowercase keyword -> framework name, matched against lowercased content
+_TS_FRAMEWORKS = {
+    b"react": "React",
+    b"vue": "Vue",
+    b"angular": "Angular",
+    b"express": "Express",
+    b"jest": "Jest",
+}
+
+_CS_PATTERNS = {
+    "class": re.compile(rb'class\s+(\w+)'),
+    "method": re.compile(rb'(?:public|private|protected|internal)\s+(?:static\s+)?(?:async\s+)?(?:\w+\s+)?(\w+)\s*\('),
+    "private": re.compile(rb'private\s+(?:readonly\s+)?\w+\s+(_\w+)'),
+    "using": re.compile(rb'using\s+([^;]+);'),
+}
+
+_GO_PATTERNS = {
+    "type": re.compile(rb'type\s+(\w+)\s+(?:struct|interface)'),
+    "func": re.compile(rb'func\s+(?:\(\w+\s+\*?\w+\)\s+)?(\w+)\s*\('),
+    "import": re.compile(rb'import\s+(?:\(\s*([^)]+)\)|"([^"]+)")', re.DOTALL),
+    "import_path": re.compile(rb'"([^"]+)"'),
+}
+
+_RUST_PATTERNS = {
+    "type": re.compile(rb'(?:struct|enum)\s+(\w+)'),
+    "func": re.compile(rb'fn\s+(\w+)'),
+    "const": re.compile(rb'const\s+([A-Z_]+):'),
+    "use": re.compile(rb'use\s+([^;]+);'),
+}
+
+_JAVA_PATTERNS = {
+    "class": re.compile(rb'class\s+(\w+)'),
+    "method": re.compile(rb'(?:public|private|protected)\s+(?:static\s+)?(?:\w+\s+)?(\w+)\s*\('),
+    "import": re.compile(rb'import\s+([^;]+);'),
+}
+
+
+def _decode(raw: bytes) -> str:
+    """Decode a matched name or module path from raw file bytes."""
+    return raw.decode("utf-8", errors="replace")
+
 
 class CodebaseAnalyzer:
     """Analyzes a codebase to extract patterns and conventions."""
 
-    def __init__(self, project_dir: Path, language: str):
+    def __init__(self, project_dir: Path, language: str, max_bytes: int = MAX_BYTES_SCANNED):
         self.project_dir = project_dir
         self.language = language
+        self.max_bytes = max_bytes
         self.files: List[Path] = []
         self.analysis = {
             "naming_conventions": {
-                "classes": [],
-                "functions": [],
-                "variables": [],
-                "constants": [],
-                "private_fields": []
+                "classes": Counter(),
+                "functions": Counter(),
+                "variables": Counter(),
+                "constants": Counter(),
+                "private_fields": Counter()
             },
             "imports": Counter(),
             "frameworks": set(),
@@ -72,340 +176,516 @@ class CodebaseAnalyzer:
             }
         }
 
-    def scan_files(self, recursive: bool = True) -> List[Path]:
-        """Scan directory for files matching the language."""
-        extensions = [ext for ext, lang in EXTENSION_MAP.items() if lang == self.language]
+        # Hot counters kept as flat attributes during analysis. The containers
+        # alias those in self.analysis; the scalars are written back by
+        # _partial_analysis and _compute_statistics.
+        self._naming = self.analysis["naming_conventions"]
+        self._imports = self.analysis["imports"]
+        self._frameworks = self.analysis["frameworks"]
+        self._patterns = self.analysis["patterns"]
+        self._common_features = self.analysis["common_features"]
+        self._max_file_length = 0
+        self._uses_type_hints = False
+        self._uses_docstrings = False
+
+        # Language-specific analyzer, resolved once rather than per file
+        self._analyzer = {
+            "python": self._analyze_python,
+            "typescript": self._analyze_typescript,
+            "javascript": self._analyze_typescript,
+            "csharp": self._analyze_csharp,
+            "go": self._analyze_go,
+            "rust": self._analyze_rust,
+            "java": self._analyze_java,
+        }.get(language)
 
-        pattern = "**/*" if recursive else "*"
+    def scan_files(self, recursive: bool = True) -> List[Path]:
+        """Scan directory for files matching the language.
 
-        for ext in extensions:
-            for filepath in self.project_dir.glob(f"{pattern}{ext}"):
-                if filepath.is_file() and not self._should_skip(filepath):
-                    self.files.append(filepath)
+        Walks the tree once, checking each file's extension with a set lookup.
+        Skipped directories are never descended into, and minified, bundled
+        or larger than SKIP_FILE_BYTES files are left out.
+        """
+        extensions = {ext for ext, lang in EXTENSION_MAP.items() if lang == self.language}
+        skipped = 0
 
-        print(f"Found {len(self.files)} {self.language} files")
+        stack = [self.project_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.warning("Could not scan %s: %s", directory, e)
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and entry.name not in _SKIP_DIRS:
+                        stack.append(entry.path)
+                    continue
+
+                name = entry.name.lower()
+                if os.path.splitext(name)[1] not in extensions or not entry.is_file():
+                    continue
+                try:
+                    generated = (
+                        name in _GENERATED_NAMES
+                        or name.endswith(_GENERATED_SUFFIXES)
+                        or entry.stat().st_size > SKIP_FILE_BYTES
+                    )
+                except OSError:
+                    generated = False
+                if generated:
+                    skipped += 1
+                else:
+                    self.files.append(Path(entry.path))
+
+        logger.info("Found %d %s files", len(self.files), self.language)
+        if skipped:
+            logger.info("Skipped %d generated or oversized files", skipped)
         return self.files
 
-    def _should_skip(self, filepath: Path) -> bool:
-        """Skip common non-source directories."""
-        skip_dirs = {
-            "node_modules", "venv", ".venv", "env", ".env",
-            "build", "dist", "target", "bin", "obj",
-            ".git", ".svn", "__pycache__", ".pytest_cache"
-        }
-        return any(part in skip_dirs for part in filepath.parts)
+    def analyze(self, jobs: Optional[int] = None, use_cache: bool = True) -> Dict:
+        """Run full analysis on all files.
 
-    def analyze(self) -> Dict:
-        """Run full analysis on all files."""
+        Files are analyzed in up to ``jobs`` worker processes (default: one
+        per CPU) and their partial results merged here. With ``use_cache``,
+        results for files whose mtime and size are unchanged since the last
+        run are read back from CACHE_FILENAME instead.
+        """
         if not self.files:
             self.scan_files()
 
-        print(f"Analyzing {len(self.files)} files...")
+        logger.info("Analyzing %d files...", len(self.files))
 
-        for filepath in self.files:
-            try:
-                content = filepath.read_text(encoding="utf-8")
-                self._analyze_file(filepath, content)
-            except Exception as e:
-                print(f"Warning: Could not analyze {filepath}: {e}")
+        if use_cache:
+            self._analyze_cached(jobs)
+        else:
+            # Without per-file cache entries to keep apart, files can share an
+            # analyzer, which lets it skip signals it has already found
+            workers = self._worker_count(jobs, len(self.files))
+            batches = self._batches(self.files, workers)
+            for _, partial, _ in self._analyze_batches(batches, workers, per_file=False):
+                self._merge_analysis(partial)
 
         self._compute_statistics()
         return self.analysis
 
-    def _analyze_file(self, filepath: Path, content: str):
-        """Analyze a single file."""
-        lines = content.split('\n')
+    def _analyze_cached(self, jobs: Optional[int]):
+        """Analyze each file on its own, reusing and refreshing the cache."""
+        cache = self._load_cache()
+        entries = {}
+        stamps = {}
+
+        for filepath in self.files:
+            key = str(filepath.absolute())
+            try:
+                stat = filepath.stat()
+            except OSError as e:
+                logger.warning("Could not analyze %s: %s", filepath, e)
+                continue
+
+            stamp = [stat.st_mtime_ns, stat.st_size]
+            cached = cache.get(key)
+            if cached and cached["language"] == self.language and cached["stamp"] == stamp:
+                self._merge_analysis(cached["analysis"])
+                entries[key] = cached
+            else:
+                stamps[filepath] = (key, stamp)
+
+        pending = list(stamps)
+        workers = self._worker_count(jobs, len(pending))
+        batches = self._batches(pending, workers)
+        for (filepath,), partial, failed in self._analyze_batches(batches, workers, per_file=True):
+            if failed:
+                continue
+            self._merge_analysis(partial)
+            key, stamp = stamps[filepath]
+            entries[key] = {"language": self.language, "stamp": stamp, "analysis": partial}
+
+        self._save_cache(cache, entries)
+
+    def _worker_count(self, jobs: Optional[int], file_count: int) -> int:
+        """Number of processes to use; 1 means analyze in this process."""
+        if file_count < PARALLEL_MIN_FILES:
+            return 1
+        return jobs or os.cpu_count() or 1
+
+    def _batches(self, files: List[Path], workers: int) -> List[List[Path]]:
+        """Split files into four batches per worker process.
+
+        Batches are capped at PROGRESS_EVERY files so progress can be
+        reported as they complete.
+        """
+        size = -(-len(files) // (workers * 4)) if workers > 1 else len(files)
+        size = min(max(size, 1), PROGRESS_EVERY)
+        return [files[i:i + size] for i in range(0, len(files), size)]
+
+    def _analyze_batches(self, batches: List[List[Path]], workers: int, per_file: bool):
+        """Yield (paths, partial analysis, failed) for each analyzer used.
+
+        With ``per_file`` every file gets its own analyzer and result;
+        otherwise each batch shares one. Files that could not be analyzed
+        are logged as warnings.
+        """
+        work = [(batch, self.language, self.max_bytes, per_file) for batch in batches]
+
+        if workers == 1:
+            yield from self._report_results(batches, map(_analyze_files_worker, work))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                yield from self._report_results(
+                    batches, executor.map(_analyze_files_worker, work)
+                )
+
+    def _report_results(self, batches: List[List[Path]], results):
+        """Log worker errors and progress, and flatten each batch's results."""
+        total = sum(map(len, batches))
+        done = 0
+        for batch, batch_results in zip(batches, results):
+            for paths, partial, errors in batch_results:
+                for filepath, error in errors:
+                    logger.warning("Could not analyze %s: %s", filepath, error)
+                yield paths, partial, bool(errors)
+
+            if (done + len(batch)) // PROGRESS_EVERY > done // PROGRESS_EVERY:
+                logger.info("Analyzed %d/%d files", done + len(batch), total)
+            done += len(batch)
+
+    def _load_cache(self) -> Dict:
+        """Load per-file results saved by a previous run."""
+        cache_file = self.project_dir / CACHE_FILENAME
+        try:
+            data = json.loads(cache_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        if data.get("max_bytes") != self.max_bytes:
+            return {}
+        return data.get("files", {})
+
+    def _save_cache(self, cache: Dict, entries: Dict):
+        """Write this run's per-file results, keeping other languages' entries."""
+        files = {
+            key: entry for key, entry in cache.items()
+            if entry.get("language") != self.language
+        }
+        files.update(entries)
+
+        cache_file = self.project_dir / CACHE_FILENAME
+        tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+        try:
+            tmp_file.write_text(
+                json.dumps(
+                    {"version": CACHE_VERSION, "max_bytes": self.max_bytes, "files": files},
+                    default=sorted
+                ),
+                encoding="utf-8"
+            )
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning("Could not write cache %s: %s", cache_file, e)
+
+    def _merge_analysis(self, partial: Dict):
+        """Fold one file's partial analysis into the running totals."""
+        for category, names in partial["naming_conventions"].items():
+            self._naming[category].update(names)
+
+        self._imports.update(partial["imports"])
+        self._frameworks.update(partial["frameworks"])
+
+        for pattern_type, found in partial["patterns"].items():
+            self._patterns[pattern_type].extend(found)
+
+        for key, count in partial["file_structure"].items():
+            self.analysis["file_structure"][key] += count
+        self._common_features.update(partial["common_features"])
+
+        file_quality = partial["code_quality"]
+        if file_quality["max_file_length"] > self._max_file_length:
+            self._max_file_length = file_quality["max_file_length"]
+        self._uses_type_hints = self._uses_type_hints or file_quality["uses_type_hints"]
+        self._uses_docstrings = self._uses_docstrings or file_quality["uses_docstrings"]
+
+    def _partial_analysis(self) -> Dict:
+        """Return the unsummarized analysis, for merging or caching."""
+        quality = self.analysis["code_quality"]
+        quality["max_file_length"] = self._max_file_length
+        quality["uses_type_hints"] = self._uses_type_hints
+        quality["uses_docstrings"] = self._uses_docstrings
+        return self.analysis
 
+    def _analyze_file(self, filepath: Path, content: bytes):
+        """Analyze a single file from its raw bytes."""
         # Track file length
-        self.analysis["code_quality"]["max_file_length"] = max(
-            self.analysis["code_quality"]["max_file_length"],
-            len(lines)
-        )
+        length = content.count(b'\n') + 1
+        if length > self._max_file_length:
+            self._max_file_length = length
 
         # Language-specific analysis
-        if self.language == "python":
-            self._analyze_python(content, lines)
-        elif self.language == "typescript" or self.language == "javascript":
-            self._analyze_typescript(content, lines)
-        elif self.language == "csharp":
-            self._analyze_csharp(content, lines)
-        elif self.language == "go":
-            self._analyze_go(content, lines)
-        elif self.language == "rust":
-            self._analyze_rust(content, lines)
-        elif self.language == "java":
-            self._analyze_java(content, lines)
-
-    def _analyze_python(self, content: str, lines: List[str]):
+        if self._analyzer is not None:
+            self._analyzer(content)
+
+    def _analyze_python(self, content: bytes):
         """Analyze Python-specific patterns."""
-        # Find class names
-        for match in re.finditer(r'^class\s+(\w+)', content, re.MULTILINE):
-            self.analysis["naming_conventions"]["classes"].append(match.group(1))
-
-        # Find function/method names
-        for match in re.finditer(r'^(?:async\s+)?def\s+(\w+)', content, re.MULTILINE):
-            func_name = match.group(1)
-            if func_name.startswith('_') and not func_name.startswith('__'):
-                self.analysis["naming_conventions"]["private_fields"].append(func_name)
+        # Find class, function, constant and import names in a single pass
+        naming = self._naming
+        for match in _PY_PATTERNS["structure"].finditer(content):
+            kind = match.lastgroup
+            name = _decode(match.group(kind))
+            if kind == "cls":
+                naming["classes"][name] += 1
+            elif kind == "fn":
+                if name.startswith('_') and not name.startswith('__'):
+                    naming["private_fields"][name] += 1
+                else:
+                    naming["functions"][name] += 1
+            elif kind == "const":
+                naming["constants"][name] += 1
             else:
-                self.analysis["naming_conventions"]["functions"].append(func_name)
+                base_module = name.split('.')[0]
+                self._imports[base_module] += 1
 
-        # Find constants (UPPERCASE)
-        for match in re.finditer(r'^([A-Z_]{2,})\s*=', content, re.MULTILINE):
-            self.analysis["naming_conventions"]["constants"].append(match.group(1))
+        # Detect frameworks against a single lowercased copy of the file,
+        # skipping the copy once every framework has been seen
+        frameworks = self._frameworks
+        if not frameworks.issuperset(_PY_FRAMEWORKS.values()):
+            lowered = content.lower()
+            frameworks.update(
+                name for keyword, name in _PY_FRAMEWORKS.items() if keyword in lowered
+            )
 
-        # Find imports
-        for match in re.finditer(r'^(?:from\s+(\S+)\s+import|import\s+(\S+))', content, re.MULTILINE):
-            module = match.group(1) or match.group(2)
-            base_module = module.split('.')[0]
-            self.analysis["imports"][base_module] += 1
+        # Check for type hints and docstrings, unless an earlier file already had them
+        if not self._uses_type_hints and _PY_PATTERNS["typehint"].search(content):
+            self._uses_type_hints = True
 
-        # Detect frameworks
-        if 'fastapi' in content.lower() or 'FastAPI' in content:
-            self.analysis["frameworks"].add("FastAPI")
-        if 'flask' in content.lower() or 'Flask' in content:
-            self.analysis["frameworks"].add("Flask")
-        if 'django' in content.lower():
-            self.analysis["frameworks"].add("Django")
-        if 'pytest' in content.lower():
-            self.analysis["frameworks"].add("pytest")
-
-        # Check for type hints
-        if re.search(r':\s*\w+\s*(?:=|\)|->', content):
-            self.analysis["code_quality"]["uses_type_hints"] = True
-
-        # Check for docstrings
-        if '"""' in content or "'''" in content:
-            self.analysis["code_quality"]["uses_docstrings"] = True
+        if not self._uses_docstrings and (b'"""' in content or b"'''" in content):
+            self._uses_docstrings = True
 
         # Error handling patterns
-        if 'try:' in content:
-            self.analysis["patterns"]["error_handling"].append("try/except blocks")
-        if 'raise ' in content:
-            self.analysis["patterns"]["error_handling"].append("explicit exceptions")
+        if b'try:' in content:
+            self._patterns["error_handling"].append("try/except blocks")
+        if b'raise ' in content:
+            self._patterns["error_handling"].append("explicit exceptions")
 
         # Async patterns
-        if 'async def' in content:
-            self.analysis["patterns"]["async_patterns"].append("async/await")
-        if 'asyncio' in content:
-            self.analysis["patterns"]["async_patterns"].append("asyncio")
+        if b'async def' in content:
+            self._patterns["async_patterns"].append("async/await")
+        if b'asyncio' in content:
+            self._patterns["async_patterns"].append("asyncio")
 
-    def _analyze_typescript(self, content: str, lines: List[str]):
+    def _analyze_typescript(self, content: bytes):
         """Analyze TypeScript/JavaScript patterns."""
+        naming = self._naming
+
         # Find class names
-        for match in re.finditer(r'class\s+(\w+)', content):
-            self.analysis["naming_conventions"]["classes"].append(match.group(1))
+        naming["classes"].update(map(_decode, _TS_PATTERNS["class"].findall(content)))
 
         # Find function names
-        for match in re.finditer(r'(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:async\s*)?\()', content):
+        for match in _TS_PATTERNS["func"].finditer(content):
             func_name = match.group(1) or match.group(2)
             if func_name:
-                self.analysis["naming_conventions"]["functions"].append(func_name)
+                naming["functions"][_decode(func_name)] += 1
 
         # Find constants
-        for match in re.finditer(r'const\s+([A-Z_]{2,})\s*=', content):
-            self.analysis["naming_conventions"]["constants"].append(match.group(1))
+        naming["constants"].update(map(_decode, _TS_PATTERNS["const"].findall(content)))
 
         # Find private fields (TypeScript)
-        for match in re.finditer(r'private\s+(\w+):', content):
-            self.analysis["naming_conventions"]["private_fields"].append(match.group(1))
+        naming["private_fields"].update(map(_decode, _TS_PATTERNS["private"].findall(content)))
 
         # Find imports
-        for match in re.finditer(r'import\s+.*?\s+from\s+[\'"]([^\'"]+)', content):
-            module = match.group(1)
+        for match in _TS_PATTERNS["import"].finditer(content):
+            module = _decode(match.group(1))
             base_module = module.split('/')[0].replace('@', '')
             if not module.startswith('.'):
-                self.analysis["imports"][base_module] += 1
+                self._imports[base_module] += 1
 
-        # Detect frameworks
-        if 'react' in content.lower() or 'React' in content:
-            self.analysis["frameworks"].add("React")
-        if 'vue' in content.lower():
-            self.analysis["frameworks"].add("Vue")
-        if 'angular' in content.lower():
-            self.analysis["frameworks"].add("Angular")
-        if 'express' in content.lower():
-            self.analysis["frameworks"].add("Express")
-        if 'jest' in content.lower() or 'describe(' in content:
-            self.analysis["frameworks"].add("Jest")
+        # Detect frameworks against a single lowercased copy of the file
+        lowered = content.lower()
+        self._frameworks.update(
+            name for keyword, name in _TS_FRAMEWORKS.items() if keyword in lowered
+        )
+        if b'describe(' in content:
+            self._frameworks.add("Jest")
 
         # Type usage
-        if ': any' in content:
-            self.analysis["common_features"]["uses_any_type"] += 1
-        if 'interface ' in content or 'type ' in content:
-            self.analysis["code_quality"]["uses_type_hints"] = True
+        if b': any' in content:
+            self._common_features["uses_any_type"] += 1
+        if b'interface ' in content or b'type ' in content:
+            self._uses_type_hints = True
 
         # Async patterns
-        if 'async ' in content or 'await ' in content:
-            self.analysis["patterns"]["async_patterns"].append("async/await")
-        if '.then(' in content:
-            self.analysis["patterns"]["async_patterns"].append("Promise chains")
+        if b'async ' in content or b'await ' in content:
+            self._patterns["async_patterns"].append("async/await")
+        if b'.then(' in content:
+            self._patterns["async_patterns"].append("Promise chains")
 
         # Error handling
-        if 'try {' in content:
-            self.analysis["patterns"]["error_handling"].append("try/catch blocks")
+        if b'try {' in content:
+            self._patterns["error_handling"].append("try/catch blocks")
 
-    def _analyze_csharp(self, content: str, lines: List[str]):
+    def _analyze_csharp(self, content: bytes):
         """Analyze C# patterns."""
+        naming = self._naming
+
         # Find class names
-        for match in re.finditer(r'class\s+(\w+)', content):
-            self.analysis["naming_conventions"]["classes"].append(match.group(1))
+        naming["classes"].update(map(_decode, _CS_PATTERNS["class"].findall(content)))
 
         # Find method names
-        for match in re.finditer(r'(?:public|private|protected|internal)\s+(?:static\s+)?(?:async\s+)?(?:\w+\s+)?(\w+)\s*\(', content):
-            self.analysis["naming_conventions"]["functions"].append(match.group(1))
+        naming["functions"].update(map(_decode, _CS_PATTERNS["method"].findall(content)))
 
         # Find private fields
-        for match in re.finditer(r'private\s+(?:readonly\s+)?\w+\s+(_\w+)', content):
-            self.analysis["naming_conventions"]["private_fields"].append(match.group(1))
+        naming["private_fields"].update(map(_decode, _CS_PATTERNS["private"].findall(content)))
 
         # Find using statements
-        for match in re.finditer(r'using\s+([^;]+);', content):
-            namespace = match.group(1).strip()
+        for match in _CS_PATTERNS["using"].finditer(content):
+            namespace = _decode(match.group(1)).strip()
             base = namespace.split('.')[0]
-            self.analysis["imports"][base] += 1
+            self._imports[base] += 1
 
         # Detect frameworks
-        if 'Entity' in content and 'Framework' in content:
-            self.analysis["frameworks"].add("Entity Framework")
-        if 'DbContext' in content:
-            self.analysis["frameworks"].add("Entity Framework")
-        if '[ApiController]' in content or 'Controller' in content:
-            self.analysis["frameworks"].add("ASP.NET Core")
-        if 'xUnit' in content or '[Fact]' in content:
-            self.analysis["frameworks"].add("xUnit")
-        if 'NUnit' in content or '[Test]' in content:
-            self.analysis["frameworks"].add("NUnit")
+        if b'Entity' in content and b'Framework' in content:
+            self._frameworks.add("Entity Framework")
+        if b'DbContext' in content:
+            self._frameworks.add("Entity Framework")
+        if b'[ApiController]' in content or b'Controller' in content:
+            self._frameworks.add("ASP.NET Core")
+        if b'xUnit' in content or b'[Fact]' in content:
+            self._frameworks.add("xUnit")
+        if b'NUnit' in content or b'[Test]' in content:
+            self._frameworks.add("NUnit")
 
         # Nullable reference types
-        if '#nullable enable' in content or '?' in content:
-            self.analysis["code_quality"]["uses_type_hints"] = True
+        if b'#nullable enable' in content or b'?' in content:
+            self._uses_type_hints = True
 
         # Async patterns
-        if 'async ' in content and 'await ' in content:
-            self.analysis["patterns"]["async_patterns"].append("async/await")
-        if '.ConfigureAwait(' in content:
-            self.analysis["patterns"]["async_patterns"].append("ConfigureAwait")
+        if b'async ' in content and b'await ' in content:
+            self._patterns["async_patterns"].append("async/await")
+        if b'.ConfigureAwait(' in content:
+            self._patterns["async_patterns"].append("ConfigureAwait")
 
         # Error handling
-        if 'try' in content and 'catch' in content:
-            self.analysis["patterns"]["error_handling"].append("try/catch blocks")
+        if b'try' in content and b'catch' in content:
+            self._patterns["error_handling"].append("try/catch blocks")
 
         # Documentation
-        if '///' in content:
-            self.analysis["patterns"]["documentation"].append("XML documentation")
+        if b'///' in content:
+            self._patterns["documentation"].append("XML documentation")
 
-    def _analyze_go(self, content: str, lines: List[str]):
+    def _analyze_go(self, content: bytes):
         """Analyze Go patterns."""
+        naming = self._naming
+
         # Find type names (structs, interfaces)
-        for match in re.finditer(r'type\s+(\w+)\s+(?:struct|interface)', content):
-            self.analysis["naming_conventions"]["classes"].append(match.group(1))
+        naming["classes"].update(map(_decode, _GO_PATTERNS["type"].findall(content)))
 
         # Find function names
-        for match in re.finditer(r'func\s+(?:\(\w+\s+\*?\w+\)\s+)?(\w+)\s*\(', content):
-            self.analysis["naming_conventions"]["functions"].append(match.group(1))
+        naming["functions"].update(map(_decode, _GO_PATTERNS["func"].findall(content)))
 
         # Find imports
-        for match in re.finditer(r'import\s+(?:\(\s*([^)]+)\)|"([^"]+)")', content, re.DOTALL):
+        for match in _GO_PATTERNS["import"].finditer(content):
             imports_block = match.group(1) or match.group(2)
-            for imp in re.finditer(r'"([^"]+)"', imports_block):
-                package = imp.group(1).split('/')[-1]
-                self.analysis["imports"][package] += 1
+            for imp in _GO_PATTERNS["import_path"].finditer(imports_block):
+                package = _decode(imp.group(1)).split('/')[-1]
+                self._imports[package] += 1
 
         # Error handling
-        if 'if err != nil' in content:
-            self.analysis["patterns"]["error_handling"].append("explicit error checking")
-        if 'defer ' in content:
-            self.analysis["patterns"]["error_handling"].append("defer for cleanup")
+        if b'if err != nil' in content:
+            self._patterns["error_handling"].append("explicit error checking")
+        if b'defer ' in content:
+            self._patterns["error_handling"].append("defer for cleanup")
 
         # Concurrency
-        if 'go func' in content or 'go ' in content:
-            self.analysis["patterns"]["async_patterns"].append("goroutines")
-        if 'chan ' in content:
-            self.analysis["patterns"]["async_patterns"].append("channels")
-        if 'sync.' in content:
-            self.analysis["patterns"]["async_patterns"].append("sync primitives")
+        if b'go func' in content or b'go ' in content:
+            self._patterns["async_patterns"].append("goroutines")
+        if b'chan ' in content:
+            self._patterns["async_patterns"].append("channels")
+        if b'sync.' in content:
+            self._patterns["async_patterns"].append("sync primitives")
 
         # Testing
-        if 'func Test' in content:
-            self.analysis["patterns"]["testing_patterns"].append("standard testing")
-        if 't.Run(' in content:
-            self.analysis["patterns"]["testing_patterns"].append("table-driven tests")
+        if b'func Test' in content:
+            self._patterns["testing_patterns"].append("standard testing")
+        if b't.Run(' in content:
+            self._patterns["testing_patterns"].append("table-driven tests")
 
-    def _analyze_rust(self, content: str, lines: List[str]):
+    def _analyze_rust(self, content: bytes):
         """Analyze Rust patterns."""
+        naming = self._naming
+
         # Find struct/enum names
-        for match in re.finditer(r'(?:pub\s+)?(?:struct|enum)\s+(\w+)', content):
-            self.analysis["naming_conventions"]["classes"].append(match.group(1))
+        naming["classes"].update(map(_decode, _RUST_PATTERNS["type"].findall(content)))
 
         # Find function names
-        for match in re.finditer(r'(?:pub\s+)?fn\s+(\w+)', content):
-            self.analysis["naming_conventions"]["functions"].append(match.group(1))
+        naming["functions"].update(map(_decode, _RUST_PATTERNS["func"].findall(content)))
 
         # Find constants
-        for match in re.finditer(r'const\s+([A-Z_]+):', content):
-            self.analysis["naming_conventions"]["constants"].append(match.group(1))
+        naming["constants"].update(map(_decode, _RUST_PATTERNS["const"].findall(content)))
 
         # Find use statements
-        for match in re.finditer(r'use\s+([^;]+);', content):
-            module = match.group(1).split('::')[0]
-            self.analysis["imports"][module] += 1
+        for match in _RUST_PATTERNS["use"].finditer(content):
+            module = _decode(match.group(1)).split('::')[0]
+            self._imports[module] += 1
 
         # Error handling
-        if 'Result<' in content:
-            self.analysis["patterns"]["error_handling"].append("Result type")
-        if '?' in content:
-            self.analysis["patterns"]["error_handling"].append("? operator")
-        if '.unwrap()' in content:
-            self.analysis["common_features"]["uses_unwrap"] += 1
+        if b'Result<' in content:
+            self._patterns["error_handling"].append("Result type")
+        if b'?' in content:
+            self._patterns["error_handling"].append("? operator")
+        if b'.unwrap()' in content:
+            self._common_features["uses_unwrap"] += 1
 
         # Async
-        if 'async fn' in content or '.await' in content:
-            self.analysis["patterns"]["async_patterns"].append("async/await")
+        if b'async fn' in content or b'.await' in content:
+            self._patterns["async_patterns"].append("async/await")
 
         # Testing
-        if '#[test]' in content:
-            self.analysis["patterns"]["testing_patterns"].append("unit tests")
-        if '#[cfg(test)]' in content:
-            self.analysis["patterns"]["testing_patterns"].append("test modules")
+        if b'#[test]' in content:
+            self._patterns["testing_patterns"].append("unit tests")
+        if b'#[cfg(test)]' in content:
+            self._patterns["testing_patterns"].append("test modules")
 
-    def _analyze_java(self, content: str, lines: List[str]):
+    def _analyze_java(self, content: bytes):
         """Analyze Java patterns."""
+        naming = self._naming
+
         # Find class names
-        for match in re.finditer(r'(?:public\s+)?class\s+(\w+)', content):
-            self.analysis["naming_conventions"]["classes"].append(match.group(1))
+        naming["classes"].update(map(_decode, _JAVA_PATTERNS["class"].findall(content)))
 
         # Find method names
-        for match in re.finditer(r'(?:public|private|protected)\s+(?:static\s+)?(?:\w+\s+)?(\w+)\s*\(', content):
-            self.analysis["naming_conventions"]["functions"].append(match.group(1))
+        naming["functions"].update(map(_decode, _JAVA_PATTERNS["method"].findall(content)))
 
         # Find imports
-        for match in re.finditer(r'import\s+([^;]+);', content):
-            package = match.group(1).split('.')[-1]
-            self.analysis["imports"][package] += 1
+        for match in _JAVA_PATTERNS["import"].finditer(content):
+            package = _decode(match.group(1)).split('.')[-1]
+            self._imports[package] += 1
 
         # Frameworks
-        if 'Spring' in content or '@Autowired' in content:
-            self.analysis["frameworks"].add("Spring")
-        if 'JUnit' in content or '@Test' in content:
-            self.analysis["frameworks"].add("JUnit")
+        if b'Spring' in content or b'@Autowired' in content:
+            self._frameworks.add("Spring")
+        if b'JUnit' in content or b'@Test' in content:
+            self._frameworks.add("JUnit")
 
         # Error handling
-        if 'try {' in content:
-            self.analysis["patterns"]["error_handling"].append("try/catch blocks")
+        if b'try {' in content:
+            self._patterns["error_handling"].append("try/catch blocks")
 
         # Documentation
-        if '/**' in content:
-            self.analysis["patterns"]["documentation"].append("JavaDoc")
+        if b'/**' in content:
+            self._patterns["documentation"].append("JavaDoc")
 
     def _compute_statistics(self):
         """Compute summary statistics."""
+        self._partial_analysis()
+
         # Determine dominant naming conventions
-        for category in ["classes", "functions", "constants", "private_fields"]:
-            items = self.analysis["naming_conventions"][category]
-            if items:
-                # Keep only most common examples
-                self.analysis["naming_conventions"][category] = list(set(items))[:10]
+        for category, counts in self.analysis["naming_conventions"].items():
+            # Keep only most common examples
+            self.analysis["naming_conventions"][category] = [
+                name for name, _ in counts.most_common(10)
+            ]
 
         # Sort imports by frequency
         top_imports = self.analysis["imports"].most_common(15)
@@ -421,6 +701,87 @@ class CodebaseAnalyzer:
             ))
 
 
+def _open_ahead(filepath: Path, max_bytes: int):
+    """Open a file and ask the kernel to start reading its head in the background.
+
+    Returns the open file, or the exception if it could not be opened.
+    """
+    try:
+        f = open(filepath, 'rb')
+    except OSError as e:
+        return e
+    if _FADVISE:
+        try:
+            os.posix_fadvise(f.fileno(), 0, max_bytes, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+    return f
+
+
+def _read_files(
+    filepaths: List[Path], max_bytes: int
+) -> Iterator[Tuple[Path, Optional[bytes], Optional[str]]]:
+    """Yield (path, content, error) for each file, in order.
+
+    Only the first ``max_bytes`` of each file are read (0 reads everything).
+
+    The next READ_AHEAD files are opened early with a WILLNEED hint, so the
+    kernel pulls them into the page cache while earlier files are analyzed.
+    Where the hint is unavailable this is just a sequential read.
+    """
+    remaining = iter(filepaths)
+    pending = deque(
+        (filepath, _open_ahead(filepath, max_bytes))
+        for filepath in islice(remaining, READ_AHEAD)
+    )
+    while pending:
+        filepath, f = pending.popleft()
+        for next_path in islice(remaining, 1):
+            pending.append((next_path, _open_ahead(next_path, max_bytes)))
+        if isinstance(f, Exception):
+            yield filepath, None, str(f)
+            continue
+        try:
+            with f:
+                content = f.read(max_bytes or -1)
+        except OSError as e:
+            yield filepath, None, str(e)
+        else:
+            yield filepath, content, None
+
+
+def _analyze_files_worker(
+    job: Tuple[List[Path], str, int, bool]
+) -> List[Tuple[List[Path], Dict, List[Tuple[Path, str]]]]:
+    """Analyze a batch of files.
+
+    Module-level so it can be shipped to a ProcessPoolExecutor. The files
+    share one analyzer, or get one each when ``per_file`` is set. Returns
+    (paths, partial analysis, errors) per analyzer, where errors are
+    (path, message) pairs for files that could not be read or analyzed.
+    """
+    filepaths, language, max_bytes, per_file = job
+    results = []
+    for filepath, content, error in _read_files(filepaths, max_bytes):
+        if per_file or not results:
+            analyzer = CodebaseAnalyzer(Path(), language)
+            results.append((analyzer, [], []))
+        _, paths, errors = results[-1]
+        paths.append(filepath)
+
+        if error is None:
+            try:
+                analyzer._analyze_file(filepath, content)
+            except Exception as e:
+                error = str(e)
+        if error is not None:
+            errors.append((filepath, error))
+    return [
+        (paths, analyzer._partial_analysis(), errors)
+        for analyzer, paths, errors in results
+    ]
+
+
 class PromptGenerator:
     """Generates a custom review prompt based on codebase analysis."""
 
@@ -449,10 +810,7 @@ class PromptGenerator:
 
 This prompt was auto-generated by analyzing the existing codebase to extract
 coding conventions, patterns, and standards. Review new code to ensure it
-matches the established patterns in this project.
-
-File: {{filename}}
-Language: {{language}}"""
+matches the established patterns in this project."""
 
     def _generate_naming_conventions(self) -> str:
         """Generate naming conventions section."""
@@ -603,6 +961,9 @@ Prioritize issues by severity:
 - MEDIUM: Minor style issues, optimization opportunities
 - LOW: Suggestions for improvement
 
+File: {filename}
+Language: {language}
+
 ```{language}
 {code}
 ```
@@ -610,6 +971,16 @@ Prioritize issues by severity:
 Review:"""
 
 
+class _LogFormatter(logging.Formatter):
+    """Plain progress lines; warnings and errors keep a "Warning:" style prefix."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        if record.levelno >= logging.WARNING:
+            return f"{record.levelname.capitalize()}: {message}"
+        return message
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Prompt Builder - Generate custom code review prompts from existing codebases",
@@ -662,8 +1033,38 @@ prompt file that can be used with reviewer_claude.py or reviewer.py.
         help="Don't scan subdirectories"
     )
 
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Re-analyze every file instead of reusing {CACHE_FILENAME}"
+    )
+
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=MAX_BYTES_SCANNED,
+        help=f"Scan only the first N bytes of each file (default: {MAX_BYTES_SCANNED}, 0 for no limit)"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        help="Number of worker processes (default: one per CPU, 1 to disable)"
+    )
+
+    parser.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        help="Don't report progress or per-file warnings"
+    )
+
     args = parser.parse_args()
 
+    handler = logging.StreamHandler()
+    handler.setFormatter(_LogFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.ERROR if args.quiet else logging.INFO)
+
     if not args.project_dir.exists():
         print(f"Error: Directory not found: {args.project_dir}")
         sys.exit(1)
@@ -680,14 +1081,14 @@ prompt file that can be used with reviewer_claude.py or reviewer.py.
     print(f"Analyzing {project_name} ({args.language})")
     print(f"{'='*60}\n")
 
-    analyzer = CodebaseAnalyzer(args.project_dir, args.language)
+    analyzer = CodebaseAnalyzer(args.project_dir, args.language, max_bytes=args.max_bytes)
     analyzer.scan_files(recursive=not args.no_recursive)
 
     if not analyzer.files:
         print(f"No {args.language} files found in {args.project_dir}")
         sys.exit(1)
 
-    analysis = analyzer.analyze()
+    analysis = analyzer.analyze(jobs=args.jobs, use_cache=not args.no_cache)
 
     # Output JSON if requested
     if args.json:
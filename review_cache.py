@@ -0,0 +1,290 @@
+"""
+Review Cache - Reuse LLM reviews of code that has not changed
+
+Reviews are stored on disk, keyed by a hash of everything that was sent
+to the model, so re-reviewing an unchanged file costs a file read instead
+of an API call. Used by both reviewer.py and reviewer_claude.py.
+
+Entries live under ~/.cache/codereviewer (or $CODEREVIEWER_CACHE_DIR) as
+<key[:2]>/<key>.json, expire after the configured TTL, and the least
+recently used ones are evicted once the directory grows past
+MAX_CACHE_BYTES. index.json remembers each reviewed file's mtime, size
+and hash, so an untouched file is not even re-hashed.
+
+semantic.json is an optional second tier: embeddings of reviewed code, so
+a near-identical file can reuse an exact entry's review.
+"""
+
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+CACHE_DIR = Path(
+    os.environ.get("CODEREVIEWER_CACHE_DIR") or Path.home() / ".cache" / "codereviewer"
+)
+DEFAULT_TTL_HOURS = 24 * 7
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+INDEX_FILE = CACHE_DIR / "index.json"
+# Files modified this recently are hashed but not indexed, since a second
+# write within the same mtime tick would go unnoticed
+RACY_SECONDS = 2
+# Index entries kept, most recently hashed last; older ones are dropped
+MAX_INDEX_ENTRIES = 20000
+SEMANTIC_FILE = CACHE_DIR / "semantic.json"
+MAX_SEMANTIC_ENTRIES = 2000
+
+_settings = {"enabled": True, "ttl": DEFAULT_TTL_HOURS * 3600}
+_evict_lock = threading.Lock()
+_evicted = False
+_index_lock = threading.Lock()
+_index = None
+_index_dirty = False
+_semantic_lock = threading.Lock()
+_semantic = None
+_semantic_dirty = False
+
+
+def configure(enabled: bool = True, ttl_hours: float = DEFAULT_TTL_HOURS):
+    """Turn the cache on or off and set how long entries stay valid."""
+    _settings["enabled"] = enabled
+    _settings["ttl"] = ttl_hours * 3600
+
+
+def cache_key(**parts) -> str:
+    """Hash the request parts (model, prompt, options...) into a cache key."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def file_sha256(filepath: Path) -> str:
+    """Hash a file's bytes without reading it into memory."""
+    with open(filepath, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        # Before Python 3.11, hash a read-only mapping of the file instead
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
+
+def _load_index() -> dict:
+    """Read index.json on first use; path -> [mtime_ns, size, sha256].
+
+    At most MAX_INDEX_ENTRIES are kept, so paths from old checkouts age out.
+    """
+    global _index
+    if _index is None:
+        try:
+            _index = json.loads(INDEX_FILE.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _index = {}
+        atexit.register(_save_index)
+    return _index
+
+
+def _save_index():
+    """Write the index back if any file was hashed this run."""
+    if not _index_dirty:
+        return
+    try:
+        _write_json(INDEX_FILE, _index)
+    except OSError as e:
+        print(f"Warning: Could not write review cache index {INDEX_FILE}: {e}")
+
+
+def _write_json(path: Path, data):
+    """Replace path with data as JSON, atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_name, path)
+
+
+def indexed_sha256(filepath: Path) -> str:
+    """file_sha256, skipped when the file's mtime and size match the index."""
+    global _index_dirty
+    if not _settings["enabled"]:
+        return file_sha256(filepath)
+
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    with _index_lock:
+        entry = _load_index().get(path)
+    if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+        return entry[2]
+
+    digest = file_sha256(path)
+    if time.time_ns() - stat.st_mtime_ns > RACY_SECONDS * 1_000_000_000:
+        with _index_lock:
+            # Re-inserted so the dict stays ordered oldest first
+            _index.pop(path, None)
+            _index[path] = [stat.st_mtime_ns, stat.st_size, digest]
+            while len(_index) > MAX_INDEX_ENTRIES:
+                del _index[next(iter(_index))]
+            _index_dirty = True
+    return digest
+
+
+def file_key(filepath: Path, **parts) -> Optional[str]:
+    """Cache key for reviewing a file as it is on disk.
+
+    Like cache_key, but the code is identified by the file's hash, so a
+    cache hit never needs the file read or decoded, and a file whose
+    mtime and size are unchanged is not read at all. None when the cache
+    is disabled, so the file is not hashed for nothing.
+    """
+    if not _settings["enabled"]:
+        return None
+    return cache_key(code_sha256=indexed_sha256(filepath), **parts)
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def get(key: str) -> Optional[str]:
+    """Return the cached review for key, or None if missing or expired."""
+    if not _settings["enabled"]:
+        return None
+
+    path = _entry_path(key)
+    try:
+        entry = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry.get("created", 0) > _settings["ttl"]:
+        return None
+
+    # Bump the mtime so eviction treats this entry as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry.get("review")
+
+
+def put(key: str, review: str):
+    """Store a review. Error responses are never cached."""
+    if not _settings["enabled"] or review.startswith("ERROR:"):
+        return
+
+    path = _entry_path(key)
+    try:
+        _write_json(path, {"created": time.time(), "review": review})
+    except OSError as e:
+        print(f"Warning: Could not write review cache {path}: {e}")
+        return
+
+    _evict_once()
+
+
+def _evict_once():
+    """Run eviction on the first write of each process."""
+    global _evicted
+    with _evict_lock:
+        if _evicted:
+            return
+        _evicted = True
+    evict()
+
+
+def evict(max_bytes: int = MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    total = 0
+    for path in CACHE_DIR.glob("*/*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def _load_semantic() -> list:
+    """Read semantic.json on first use; a list of {scope, key, vector}."""
+    global _semantic
+    if _semantic is None:
+        try:
+            _semantic = json.loads(SEMANTIC_FILE.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _semantic = []
+        atexit.register(_save_semantic)
+    return _semantic
+
+
+def _save_semantic():
+    """Write the embeddings back if any were added this run."""
+    if not _semantic_dirty:
+        return
+    try:
+        _write_json(SEMANTIC_FILE, _semantic)
+    except OSError as e:
+        print(f"Warning: Could not write semantic cache {SEMANTIC_FILE}: {e}")
+
+
+def semantic_get(scope: str, vector: list[float], threshold: float) -> Optional[str]:
+    """Return the review of the most similar code embedded under scope.
+
+    vector must be unit length, as stored by semantic_put. Matches below
+    threshold cosine similarity, or whose review is missing or expired,
+    are ignored.
+    """
+    if not _settings["enabled"]:
+        return None
+
+    with _semantic_lock:
+        entries = [entry for entry in _load_semantic() if entry["scope"] == scope]
+    scored = sorted(
+        ((sum(a * b for a, b in zip(vector, entry["vector"])), entry["key"]) for entry in entries),
+        reverse=True
+    )
+    for similarity, key in scored:
+        if similarity < threshold:
+            break
+        review = get(key)
+        if review is not None:
+            return review
+    return None
+
+
+def semantic_put(scope: str, vector: list[float], key: str):
+    """Remember that the code embedded as vector is reviewed under key.
+
+    scope identifies everything else about the request (model, prompt...),
+    so only reviews that asked the same question are reused. The oldest
+    entries beyond MAX_SEMANTIC_ENTRIES are dropped.
+    """
+    global _semantic_dirty
+    if not _settings["enabled"]:
+        return
+
+    with _semantic_lock:
+        entries = _load_semantic()
+        entries.append({"scope": scope, "key": key, "vector": [round(x, 5) for x in vector]})
+        if len(entries) > MAX_SEMANTIC_ENTRIES:
+            del entries[:len(entries) - MAX_SEMANTIC_ENTRIES]
+        _semantic_dirty = True
@@ -4,14 +4,114 @@ Connects to Ollama running locally to review code files.
 """
 
 import argparse
+import asyncio
+import atexit
+import gzip
+import importlib.util
 import json
+import math
+import random
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import requests
-from typing import Optional
+from typing import Iterable, Iterator, Optional
+
+import review_cache
+from common import (
+    add_common_arguments,
+    apply_common_arguments,
+    detect_language,
+    echo,
+    fill_template,
+    find_files,
+    print_results,
+    print_review,
+    review_files,
+)
+
+try:
+    import httpx
+except ImportError:
+    print("Error: httpx package not installed. Run: pip install httpx")
+    sys.exit(1)
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 DEFAULT_MODEL = "deepseek-coder-v2:16b"
+DEFAULT_CONCURRENCY = 2
+NO_RESPONSE = "No response received"
+
+# Requests queued behind OLLAMA_NUM_PARALLEL wait on the server before the
+# first byte comes back, so reads get a generous timeout
+REQUEST_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+# HTTP/2 is negotiated over TLS only, so it matters just for an https
+# OLLAMA_URL, and needs the optional h2 package (pip install httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Tokens the model may generate; num_ctx has to hold these plus the prompt
+NUM_PREDICT = 2048
+
+# Files whose prompt would not fit in num_ctx are reviewed in chunks, each
+# repeating the tail of the previous one, then the part reviews are merged.
+# Token counts are estimated at CHARS_PER_TOKEN characters per token.
+CHARS_PER_TOKEN = 4
+CHUNK_OVERLAP = 0.2
+MIN_CHUNK_TOKENS = 256
+# Marks a part review cut short so the merged reviews fit one request
+TRIMMED = "\n[... part review trimmed to fit the context window]"
+
+# --prefilter embeds the start of each file and skips files that look like
+# boilerplate: those whose cosine similarity to the centroid of
+# BOILERPLATE_SAMPLES is above the threshold. /api/embed takes a batch of
+# inputs per request.
+EMBED_URL = "http://localhost:11434/api/embed"
+EMBED_MODEL = "mxbai-embed-large"
+EMBED_BATCH = 64
+EMBED_CHARS = 2000
+PREFILTER_THRESHOLD = 0.8
+BOILERPLATE_SAMPLES = [
+    "// <auto-generated>\n// This code was generated by a tool.\n"
+    "// Changes to this file may cause incorrect behavior and will be lost if the code is regenerated.\n"
+    "// </auto-generated>",
+    "# -*- coding: utf-8 -*-\n# Generated by the protocol buffer compiler.  DO NOT EDIT!\n"
+    "# source: messages.proto\n",
+    "export * from './types';\nexport * from './utils';\nexport * from './constants';\n"
+    "export { default } from './index';\n",
+    "from .models import *\nfrom .views import *\n\n__all__ = ['models', 'views']\n",
+    "VERSION = '1.0.0'\nDEBUG = False\nHOST = 'localhost'\nPORT = 8080\n"
+    "TIMEOUT = 30\nMAX_RETRIES = 3\n",
+]
+
+# --semantic-cache embeds each file that misses the exact cache and reuses
+# the review of earlier code embedded at least this similar (see
+# review_cache.semantic_get)
+SEMANTIC_THRESHOLD = 0.95
+
+# With --compress, request bodies of at least COMPRESS_MIN_BYTES are sent
+# gzipped. Ollama itself does not decode gzipped request bodies, so this is
+# for a remote Ollama behind a proxy that does; smaller bodies are not worth it.
+COMPRESS_MIN_BYTES = 4096
+
+_settings = {"compress": False, "semantic": None}
+
+# Requests that failed to connect, or that Ollama turned away as busy or
+# rate limited, are retried after RETRY_BASE_SECONDS * 2**attempt plus up
+# to a second of jitter, or after the server's Retry-After. A Retry-After
+# longer than MAX_RETRY_AFTER_SECONDS is not waited out: the error is returned
+RETRY_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 2.0
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_RETRY_AFTER_SECONDS = 60
+
+# One keep-alive client for all requests, so reviewing a directory reuses
+# connections to Ollama instead of reconnecting for every file
+_CLIENT = httpx.Client(
+    http2=HTTP2,
+    timeout=REQUEST_TIMEOUT,
+    limits=httpx.Limits(max_keepalive_connections=16, keepalive_expiry=30.0)
+)
+atexit.register(_CLIENT.close)
 
 # Base review prompt - we'll make this configurable per language later
 BASE_PROMPT = """You are an expert code reviewer. Analyze the following code and provide:
@@ -32,101 +132,649 @@ Language: {language}
 
 Review:"""
 
+# Prompt for merging the reviews of a chunked file into one
+SYNTHESIS_PROMPT = """You are an expert code reviewer. The file below was too large to review in
+one pass, so it was split into overlapping parts and each part was reviewed
+separately. Merge the part reviews into a single review of the whole file:
 
-def detect_language(filepath: Path) -> str:
-    """Detect programming language from file extension."""
-    extension_map = {
-        ".cs": "csharp",
-        ".py": "python",
-        ".js": "javascript",
-        ".ts": "typescript",
-        ".tsx": "typescript",
-        ".jsx": "javascript",
-        ".java": "java",
-        ".go": "go",
-        ".rs": "rust",
-        ".cpp": "cpp",
-        ".c": "c",
-        ".rb": "ruby",
-        ".php": "php",
-        ".swift": "swift",
-        ".kt": "kotlin",
-    }
-    return extension_map.get(filepath.suffix.lower(), "unknown")
+1. **Issues**: Any bugs, potential errors, or problematic patterns
+2. **Improvements**: Suggestions for better code quality, readability, or performance
+3. **Security**: Any security concerns if applicable
+4. **Summary**: Brief overall assessment
 
+Drop duplicates caused by the overlap between parts and keep the most
+important items. Be concise and actionable.
 
-def review_code(
+File: {filename}
+Language: {language}
+
+{code}
+
+Review:"""
+
+
+def build_payload(
     code: str,
     filename: str,
     language: str,
     model: str = DEFAULT_MODEL,
     custom_prompt: Optional[str] = None,
     ctx_size: int = 8192
-) -> str:
-    """Send code to Ollama for review."""
-    
+) -> dict:
+    """Build the Ollama generate request for a piece of code."""
     prompt = custom_prompt or BASE_PROMPT
-    full_prompt = prompt.format(
-        filename=filename,
-        language=language,
-        code=code
-    )
+    full_prompt = "".join(fill_template(prompt, filename, language, code))
     
-    payload = {
+    return {
         "model": model,
         "prompt": full_prompt,
         "stream": False,
         "options": {
             "temperature": 0.3,  # Lower for more focused responses
-            "num_predict": 2048,  # Max tokens to generate
+            "num_predict": NUM_PREDICT,  # Max tokens to generate
             "num_ctx": ctx_size,  # Context window - increase if model supports it
         }
     }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, good enough to decide whether a prompt fits."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def code_budget(custom_prompt: Optional[str] = None, ctx_size: int = 8192) -> int:
+    """Tokens of code that fit in one request alongside the prompt and the reply.
+
+    Below MIN_CHUNK_TOKENS, ctx_size is too small to review with (see
+    context_error).
+    """
+    overhead = estimate_tokens(custom_prompt or BASE_PROMPT) + NUM_PREDICT
+    return ctx_size - overhead
+
+
+def context_error(custom_prompt: Optional[str] = None, ctx_size: int = 8192) -> Optional[str]:
+    """The "ERROR: ..." review for a ctx_size too small for any request, or None."""
+    budget = code_budget(custom_prompt, ctx_size)
+    if budget >= MIN_CHUNK_TOKENS:
+        return None
+    needed = ctx_size - budget + MIN_CHUNK_TOKENS
+    return (
+        f"ERROR: ctx_size too small: {ctx_size} tokens cannot hold the prompt, "
+        f"{NUM_PREDICT} tokens of reply and some code. Use --ctx-size {needed} or more."
+    )
+
+
+def chunk_code(code: str, max_tokens: int, overlap: float = CHUNK_OVERLAP) -> list[str]:
+    """Split code into chunks of at most about max_tokens.
+
+    Splits fall between paragraphs: a new block starts at an unindented
+    line after a blank line, which is where top-level functions and
+    classes begin in most languages. Blocks are packed into chunks, and
+    only a block too large for one chunk is split between lines (and a
+    line too large for one, such as minified code, by characters). Every
+    chunk after the first starts with the last ``overlap`` share of the
+    previous one, so code at a split is seen whole at least once.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(code) <= max_chars:
+        return [code]
     
-    try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=120)
-        response.raise_for_status()
-        result = response.json()
-        return result.get("response", "No response received")
-    except requests.exceptions.ConnectionError:
+    lines = code.splitlines(keepends=True)
+    budget = int(max_chars * (1 - overlap))
+    
+    blocks = [[]]
+    for i, line in enumerate(lines):
+        starts_block = line[:1].strip() and line[0] not in "})]" and not lines[i - 1].strip()
+        if starts_block and blocks[-1]:
+            blocks.append([])
+        blocks[-1].append(line)
+    
+    # Pack blocks into chunks, breaking up any block that cannot fit alone
+    chunks = [[]]
+    size = 0
+    for block in blocks:
+        block_size = sum(map(len, block))
+        if block_size <= budget:
+            pieces = [block]
+        else:
+            pieces = [
+                [line[start:start + budget]]
+                for line in block
+                for start in range(0, len(line), budget)
+            ]
+        for piece in pieces:
+            piece_size = sum(map(len, piece))
+            if chunks[-1] and size + piece_size > budget:
+                chunks.append([])
+                size = 0
+            chunks[-1].extend(piece)
+            size += piece_size
+    
+    result = ["".join(chunks[0])]
+    for previous, chunk in zip(chunks, chunks[1:]):
+        tail = []
+        size = 0
+        for line in reversed(previous):
+            if size + len(line) > max_chars - budget:
+                break
+            tail.append(line)
+            size += len(line)
+        result.append("".join(reversed(tail)) + "".join(chunk))
+    return result
+
+
+def failed(review: str) -> bool:
+    """Whether a review is an error or empty rather than a real review."""
+    return review.startswith("ERROR:") or review == NO_RESPONSE
+
+
+def part_names(filename: str, count: int) -> list[str]:
+    """Names the chunks of a file are reviewed under."""
+    return [f"{filename} (part {i} of {count})" for i in range(1, count + 1)]
+
+
+def merge_input(names: list[str], reviews: list[str], max_chars: int) -> str:
+    """Lay out the part reviews as the input of SYNTHESIS_PROMPT.
+
+    The result fits in max_chars: short reviews are kept whole and the
+    rest share what is left equally, cut off with a marker.
+    """
+    headers = [f"### Review of {name}\n\n" for name in names]
+    room = max_chars - sum(map(len, headers)) - 2 * (len(names) - 1)
+    
+    limits = {}
+    for done, i in enumerate(sorted(range(len(reviews)), key=lambda i: len(reviews[i]))):
+        limits[i] = max(room // (len(reviews) - done), 0)
+        room -= min(len(reviews[i]), limits[i])
+    
+    trimmed = []
+    for i, review in enumerate(reviews):
+        if len(review) > limits[i]:
+            review = review[:max(limits[i] - len(TRIMMED), 0)] + TRIMMED
+        trimmed.append(review)
+    return "\n\n".join(header + review for header, review in zip(headers, trimmed))
+
+
+def review_chunks(
+    chunks: list[str],
+    filename: str,
+    language: str,
+    model: str = DEFAULT_MODEL,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    stream: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> str:
+    """Review each chunk of a file, then merge the part reviews into one.
+
+    Every part and the merge are one request each: chunks already fit,
+    and the merge input is cut to fit, so nothing is chunked again. Up to
+    ``concurrency`` parts are reviewed at once. With ``stream`` only the
+    merged review is printed as it is generated.
+    """
+    names = part_names(filename, len(chunks))
+    
+    payloads = [
+        build_payload(chunk, name, language, model, custom_prompt, ctx_size)
+        for chunk, name in zip(chunks, names)
+    ]
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        reviews = list(executor.map(generate, payloads))
+    
+    for review in reviews:
+        if failed(review):
+            return review
+    
+    budget = max(code_budget(SYNTHESIS_PROMPT, ctx_size), MIN_CHUNK_TOKENS) * CHARS_PER_TOKEN
+    merged = merge_input(names, reviews, budget)
+    return generate(build_payload(merged, filename, language, model, SYNTHESIS_PROMPT, ctx_size), stream)
+
+
+async def areview_chunks(
+    client: "httpx.AsyncClient",
+    chunks: list[str],
+    filename: str,
+    language: str,
+    model: str = DEFAULT_MODEL,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> str:
+    """Async counterpart of review_chunks."""
+    names = part_names(filename, len(chunks))
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    
+    async def review_part(chunk: str, name: str) -> str:
+        payload = build_payload(chunk, name, language, model, custom_prompt, ctx_size)
+        async with semaphore:
+            return await agenerate(client, payload)
+    
+    reviews = await asyncio.gather(*(review_part(chunk, name) for chunk, name in zip(chunks, names)))
+    
+    for review in reviews:
+        if failed(review):
+            return review
+    
+    budget = max(code_budget(SYNTHESIS_PROMPT, ctx_size), MIN_CHUNK_TOKENS) * CHARS_PER_TOKEN
+    merged = merge_input(names, reviews, budget)
+    return await agenerate(
+        client, build_payload(merged, filename, language, model, SYNTHESIS_PROMPT, ctx_size)
+    )
+
+
+def ndjson_frames(chunks: Iterable[str]) -> Iterator[dict]:
+    """Parse newline-delimited JSON from text chunks that may split anywhere.
+
+    A chunk can hold several frames or end mid-frame, so only complete
+    lines are parsed and the incomplete tail waits for the next chunk. The
+    tail is kept as a list of fragments and joined once its line ends, so
+    a frame spread over many chunks costs linear time. An unterminated
+    last line is parsed at the end if it looks complete, and dropped if
+    truncated.
+    """
+    tail = []
+    for chunk in chunks:
+        tail.append(chunk)
+        if "\n" not in chunk:
+            continue
+        
+        lines = "".join(tail).split("\n")
+        tail = [lines.pop()]
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    
+    last = "".join(tail).rstrip()
+    if last.endswith("}"):
+        try:
+            yield json.loads(last)
+        except ValueError:
+            pass
+
+
+def request_body(payload: dict) -> dict:
+    """Keyword arguments sending payload as the JSON body of a request."""
+    if not _settings["compress"]:
+        return {"json": payload}
+    body = json.dumps(payload).encode("utf-8")
+    if len(body) < COMPRESS_MIN_BYTES:
+        return {"json": payload}
+    return {
+        "content": gzip.compress(body, compresslevel=1),
+        "headers": {"Content-Encoding": "gzip", "Content-Type": "application/json"},
+    }
+
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after error, or None to give up.
+
+    Only failures that happen before any response text arrives are
+    retried, so a streamed review is never printed twice.
+    """
+    if attempt + 1 >= RETRY_ATTEMPTS:
+        return None
+    if isinstance(error, httpx.HTTPStatusError):
+        if error.response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = error.response.headers.get("retry-after", "")
+        if retry_after.isdigit():
+            delay = float(retry_after)
+            return delay if delay <= MAX_RETRY_AFTER_SECONDS else None
+    elif not isinstance(error, httpx.ConnectError):
+        return None
+    return RETRY_BASE_SECONDS * 2 ** attempt + random.random()
+
+
+def error_message(error: Exception) -> str:
+    """The "ERROR: ..." string a failed Ollama request is reported as."""
+    if isinstance(error, httpx.ConnectError):
         return "ERROR: Cannot connect to Ollama. Is it running? (docker ps)"
-    except requests.exceptions.Timeout:
+    if isinstance(error, httpx.TimeoutException):
         return "ERROR: Request timed out. The model might be overloaded."
-    except Exception as e:
-        return f"ERROR: {str(e)}"
+    return f"ERROR: {str(error)}"
+
+
+def generate(payload: dict, stream: bool = False) -> str:
+    """Send a generate request to Ollama and return the response text.
+
+    With ``stream``, the response is printed as it is generated. Transient
+    failures are retried (see retry_delay); others come back as
+    "ERROR: ..." strings.
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return _generate(payload, stream)
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                return error_message(e)
+            time.sleep(delay)
+
+
+def _generate(payload: dict, stream: bool) -> str:
+    if not stream:
+        response = _CLIENT.post(OLLAMA_URL, **request_body(payload))
+        response.raise_for_status()
+        return response.json().get("response", NO_RESPONSE)
+    
+    parts = []
+    body = request_body({**payload, "stream": True})
+    with _CLIENT.stream("POST", OLLAMA_URL, **body) as response:
+        response.raise_for_status()
+        for frame in ndjson_frames(response.iter_text()):
+            if "error" in frame:
+                echo("\n")
+                return f"ERROR: {frame['error']}"
+            text = frame.get("response", "")
+            echo(text)
+            parts.append(text)
+            if frame.get("done"):
+                break
+    echo("\n")
+    return "".join(parts) or NO_RESPONSE
+
+
+async def agenerate(client: "httpx.AsyncClient", payload: dict) -> str:
+    """Async counterpart of generate, without streaming."""
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            response = await client.post(OLLAMA_URL, **request_body(payload))
+            response.raise_for_status()
+            return response.json().get("response", NO_RESPONSE)
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                return error_message(e)
+            await asyncio.sleep(delay)
+
 
+def review_code(
+    code: str,
+    filename: str,
+    language: str,
+    model: str = DEFAULT_MODEL,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    cache_key: Optional[str] = None,
+    stream: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> str:
+    """Send code to Ollama for review, unless a cached review exists.
+
+    Code too large for ``ctx_size`` is reviewed in chunks (see chunk_code);
+    a ``ctx_size`` too small for even one chunk gives an "ERROR: ..." review.
+    With ``stream``, the returned review has also been printed, as it was
+    generated where possible.
+    """
+    payload = build_payload(code, filename, language, model, custom_prompt, ctx_size)
+    cache_key = cache_key or review_cache.cache_key(backend="ollama", payload=payload)
+    cached = review_cache.get(cache_key)
+    if cached is not None:
+        if stream:
+            echo(cached + "\n")
+        return cached
+    
+    error = context_error(custom_prompt, ctx_size)
+    chunks = [] if error else chunk_code(code, code_budget(custom_prompt, ctx_size))
+    if error:
+        review = error
+    elif len(chunks) > 1:
+        review = review_chunks(
+            chunks, filename, language, model, custom_prompt, ctx_size, stream, concurrency
+        )
+    else:
+        review = generate(payload, stream)
+    if failed(review):
+        if stream:
+            echo(review + "\n")
+        return review
+    review_cache.put(cache_key, review)
+    return review
+
+
+async def areview_code(
+    client: "httpx.AsyncClient",
+    code: str,
+    filename: str,
+    language: str,
+    model: str = DEFAULT_MODEL,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    cache_key: Optional[str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> str:
+    """Send code to Ollama for review without blocking the event loop."""
+    payload = build_payload(code, filename, language, model, custom_prompt, ctx_size)
+    cache_key = cache_key or review_cache.cache_key(backend="ollama", payload=payload)
+    cached = review_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    error = context_error(custom_prompt, ctx_size)
+    chunks = [] if error else chunk_code(code, code_budget(custom_prompt, ctx_size))
+    if error:
+        review = error
+    elif len(chunks) > 1:
+        review = await areview_chunks(
+            client, chunks, filename, language, model, custom_prompt, ctx_size, concurrency
+        )
+    else:
+        review = await agenerate(client, payload)
+    if not failed(review):
+        review_cache.put(cache_key, review)
+    return review
+
+
+def read_source(
+    filepath: Path,
+    model: str,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192
+) -> tuple[Optional[str], dict, Optional[str]]:
+    """Read a file for review.
 
-def review_file(filepath: Path, model: str, custom_prompt: Optional[str] = None, ctx_size: int = 8192) -> dict:
-    """Review a single file."""
+    Returns the code, the start of its result dict and the review's cache
+    key. The file is hashed before it is read, so on a cache hit it is
+    never loaded: the code is None and the result already holds the
+    cached review. On errors the code is None and the result says why.
+    """
     if not filepath.exists():
-        return {"file": str(filepath), "error": "File not found"}
+        return None, {"file": str(filepath), "error": "File not found"}, None
     
     if not filepath.is_file():
-        return {"file": str(filepath), "error": "Not a file"}
+        return None, {"file": str(filepath), "error": "Not a file"}, None
+    
+    language = detect_language(filepath)
     
     try:
+        # Everything that is sent except the code, which is hashed from disk
+        payload = build_payload("", filepath.name, language, model, custom_prompt, ctx_size)
+        cache_key = review_cache.file_key(filepath, backend="ollama", payload=payload)
+        cached = review_cache.get(cache_key)
+        if cached is not None:
+            return None, {"file": str(filepath), "language": language, "review": cached}, None
+        
         code = filepath.read_text(encoding="utf-8")
     except Exception as e:
-        return {"file": str(filepath), "error": f"Cannot read file: {e}"}
+        return None, {"file": str(filepath), "error": f"Cannot read file: {e}"}, None
     
-    language = detect_language(filepath)
+    threshold = _settings["semantic"]
+    if threshold is not None and code.strip():
+        # Near-identical code in any file, reviewed with the same model and prompt
+        scope = review_cache.cache_key(
+            backend="ollama", payload=build_payload("", "", language, model, custom_prompt, ctx_size)
+        )
+        try:
+            vector = embed_code(code)
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            print(f"Warning: Semantic cache skipped for {filepath.name}: {e}")
+        else:
+            cached = review_cache.semantic_get(scope, vector, threshold)
+            if cached is not None:
+                result = {"file": str(filepath), "language": language, "review": cached}
+                return None, {**result, "cache": "semantic"}, None
+            review_cache.semantic_put(scope, vector, cache_key)
     
     print(f"📝 Reviewing: {filepath.name} ({language})...")
     
-    review = review_code(
+    return code, {"file": str(filepath), "language": language}, cache_key
+
+
+def review_file(
+    filepath: Path,
+    model: str,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    stream: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> dict:
+    """Review a single file, printing the review as it arrives with ``stream``.
+
+    A file reviewed in chunks has up to ``concurrency`` of them in flight.
+    """
+    code, result, cache_key = read_source(filepath, model, custom_prompt, ctx_size)
+    if code is None:
+        if stream and "review" in result:
+            # Name the file before its cached review, as "Reviewing" would
+            print(f"📝 Cached review: {filepath.name} ({result['language']})")
+            echo(result["review"] + "\n")
+        return result
+    
+    result["review"] = review_code(
         code=code,
         filename=filepath.name,
-        language=language,
+        language=result["language"],
         model=model,
         custom_prompt=custom_prompt,
-        ctx_size=ctx_size
+        ctx_size=ctx_size,
+        cache_key=cache_key,
+        stream=stream,
+        concurrency=concurrency
+    )
+    return result
+
+
+async def areview_file(
+    client: "httpx.AsyncClient",
+    filepath: Path,
+    model: str,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> dict:
+    """Review a single file on the event loop.
+
+    Hashing and reading the file run in a worker thread, so other reviews
+    keep streaming while it waits on the disk.
+    """
+    code, result, cache_key = await asyncio.to_thread(
+        read_source, filepath, model, custom_prompt, ctx_size
     )
+    if code is None:
+        return result
     
-    return {
-        "file": str(filepath),
-        "language": language,
-        "review": review
-    }
+    result["review"] = await areview_code(
+        client,
+        code=code,
+        filename=filepath.name,
+        language=result["language"],
+        model=model,
+        custom_prompt=custom_prompt,
+        ctx_size=ctx_size,
+        cache_key=cache_key,
+        concurrency=concurrency
+    )
+    return result
+
+
+def embed(texts: list[str], model: str = EMBED_MODEL) -> list[list[float]]:
+    """Embed texts with Ollama, EMBED_BATCH inputs per request."""
+    embeddings = []
+    for start in range(0, len(texts), EMBED_BATCH):
+        response = _CLIENT.post(
+            EMBED_URL, **request_body({"model": model, "input": texts[start:start + EMBED_BATCH]})
+        )
+        response.raise_for_status()
+        embeddings.extend(response.json()["embeddings"])
+    return embeddings
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.sqrt(math.fsum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def embed_code(code: str) -> list[float]:
+    """Unit embedding of a whole file: the mean of its EMBED_CHARS slices."""
+    slices = [code[start:start + EMBED_CHARS] for start in range(0, len(code), EMBED_CHARS)]
+    vectors = [_unit(vector) for vector in embed(slices or [""])]
+    return _unit([math.fsum(column) for column in zip(*vectors)])
+
+
+def prefilter(filepaths: list[Path], threshold: float = PREFILTER_THRESHOLD) -> list[Path]:
+    """Drop files that look like boilerplate, judged by their embeddings.
+
+    Only the first EMBED_CHARS characters of each file are embedded.
+    Empty files are always skipped and unreadable ones always kept. If
+    embedding fails, nothing is skipped.
+    """
+    heads = {}
+    for filepath in filepaths:
+        try:
+            with open(filepath, encoding="utf-8", errors="replace") as f:
+                heads[filepath] = f.read(EMBED_CHARS)
+        except OSError:
+            pass  # Reviewed anyway, so the error is reported
+    
+    # Empty files are skipped without being embedded
+    inputs = BOILERPLATE_SAMPLES + [head for head in heads.values() if head.strip()]
+    try:
+        vectors = embed(inputs)
+        if len(vectors) != len(inputs):
+            raise ValueError(f"{len(vectors)} embeddings for {len(inputs)} inputs")
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        print(f"Warning: Prefilter disabled, embedding failed: {e}")
+        return filepaths
+    
+    samples = [_unit(v) for v in vectors[:len(BOILERPLATE_SAMPLES)]]
+    centroid = _unit([math.fsum(column) for column in zip(*samples)])
+    file_vectors = iter(vectors[len(BOILERPLATE_SAMPLES):])
+    
+    kept = []
+    for filepath in filepaths:
+        head = heads.get(filepath)
+        if head is None:
+            kept.append(filepath)
+        elif not head.strip():
+            print(f"⏭️  Skipping: {filepath.name} (empty)")
+        else:
+            similarity = math.fsum(a * b for a, b in zip(centroid, _unit(next(file_vectors))))
+            if similarity > threshold:
+                print(f"⏭️  Skipping: {filepath.name} (looks like boilerplate, similarity {similarity:.2f})")
+            else:
+                kept.append(filepath)
+    return kept
+
+
+class OllamaBackend:
+    """The Ollama reviewer as a common.Backend."""
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        custom_prompt: Optional[str] = None,
+        ctx_size: int = 8192,
+        concurrency: int = DEFAULT_CONCURRENCY
+    ):
+        self.model = model
+        self.custom_prompt = custom_prompt
+        self.ctx_size = ctx_size
+        self.concurrency = concurrency
+
+    def review_file(self, filepath: Path, stream: bool = False) -> dict:
+        return review_file(
+            filepath, self.model, self.custom_prompt, self.ctx_size, stream, self.concurrency
+        )
 
 
 def review_directory(
@@ -135,39 +783,54 @@ def review_directory(
     model: str,
     recursive: bool = False,
     custom_prompt: Optional[str] = None,
-    ctx_size: int = 8192
+    ctx_size: int = 8192,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    stream: bool = False,
+    prefilter_threshold: Optional[float] = None
 ) -> list[dict]:
-    """Review all matching files in a directory."""
-    results = []
-    
-    pattern = "**/*" if recursive else "*"
-    
-    for ext in extensions:
-        for filepath in dirpath.glob(f"{pattern}{ext}"):
-            if filepath.is_file():
-                result = review_file(filepath, model, custom_prompt, ctx_size)
-                results.append(result)
+    """Review all matching files in a directory (see common.review_files).
+
+    With ``prefilter_threshold``, likely boilerplate is skipped (see prefilter).
+    """
+    filepaths = find_files(dirpath, extensions, recursive)
+    if prefilter_threshold is not None:
+        filepaths = prefilter(filepaths, prefilter_threshold)
     
-    return results
+    backend = OllamaBackend(model, custom_prompt, ctx_size, concurrency)
+    return review_files(backend, filepaths, concurrency, stream)
 
 
-def print_review(result: dict, output_format: str = "text"):
-    """Print review result."""
-    if output_format == "json":
-        print(json.dumps(result, indent=2))
-        return
-    
-    print("\n" + "=" * 60)
-    print(f"📄 File: {result['file']}")
+async def areview_directory(
+    dirpath: Path,
+    extensions: list[str],
+    model: str,
+    recursive: bool = False,
+    custom_prompt: Optional[str] = None,
+    ctx_size: int = 8192,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    prefilter_threshold: Optional[float] = None
+) -> list[dict]:
+    """Review all matching files in a directory on one event loop.
+
+    Same results as review_directory, but the requests share a single
+    async client. Up to ``concurrency`` files are reviewed at once, and a
+    file reviewed in chunks sends up to ``concurrency`` parts at once.
+    """
+    filepaths = find_files(dirpath, extensions, recursive)
+    if prefilter_threshold is not None:
+        filepaths = await asyncio.to_thread(prefilter, filepaths, prefilter_threshold)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
     
-    if "error" in result:
-        print(f"❌ Error: {result['error']}")
-    else:
-        print(f"🔤 Language: {result.get('language', 'unknown')}")
-        print("-" * 60)
-        print(result.get("review", "No review generated"))
+    async def review_one(client: "httpx.AsyncClient", filepath: Path) -> dict:
+        async with semaphore:
+            return await areview_file(client, filepath, model, custom_prompt, ctx_size, concurrency)
     
-    print("=" * 60)
+    async with httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_keepalive_connections=max(concurrency, 1))
+    ) as client:
+        return await asyncio.gather(*(review_one(client, filepath) for filepath in filepaths))
 
 
 def main():
@@ -181,82 +844,99 @@ Examples:
   %(prog)s src/ -e .cs -r             Review recursively
   %(prog)s file.cs --json             Output as JSON
   %(prog)s file.cs -m codellama:13b   Use different model
+  %(prog)s src/ -r --async -c 8       Review concurrently on one event loop
+  %(prog)s src/ -r --prefilter        Skip files that look like boilerplate
+
+Ollama handles OLLAMA_NUM_PARALLEL requests at once (set on the server) and
+queues the rest, so --concurrency above that only adds queueing.
         """
     )
     
-    parser.add_argument(
-        "path",
-        type=Path,
-        help="File or directory to review"
+    add_common_arguments(
+        parser, DEFAULT_MODEL, "Ollama", DEFAULT_CONCURRENCY,
+        "Ollama queues requests beyond its OLLAMA_NUM_PARALLEL"
     )
     
     parser.add_argument(
-        "-e", "--extensions",
-        nargs="+",
-        default=[".cs", ".py", ".ts", ".js"],
-        help="File extensions to review (default: .cs .py .ts .js)"
+        "--ctx-size",
+        type=int,
+        default=8192,
+        help="Context window size (default: 8192, use 16384+ for larger files)"
     )
     
     parser.add_argument(
-        "-r", "--recursive",
+        "--async",
+        dest="use_async",
         action="store_true",
-        help="Review files recursively in directories"
+        help="Review directories on one asyncio event loop instead of threads"
     )
     
     parser.add_argument(
-        "-m", "--model",
-        default=DEFAULT_MODEL,
-        help=f"Ollama model to use (default: {DEFAULT_MODEL})"
+        "--prefilter",
+        type=float,
+        nargs="?",
+        const=PREFILTER_THRESHOLD,
+        metavar="THRESHOLD",
+        help=f"Skip directory files whose embedding ({EMBED_MODEL}) is this similar to "
+             f"boilerplate (default threshold: {PREFILTER_THRESHOLD})"
     )
     
     parser.add_argument(
-        "--json",
-        action="store_true",
-        help="Output results as JSON"
-    )
-    
-    parser.add_argument(
-        "--prompt-file",
-        type=Path,
-        help="Custom prompt template file"
+        "--semantic-cache",
+        type=float,
+        nargs="?",
+        const=SEMANTIC_THRESHOLD,
+        metavar="THRESHOLD",
+        help="Also reuse the review of code whose embedding is at least this similar "
+             f"(default threshold: {SEMANTIC_THRESHOLD})"
     )
     
     parser.add_argument(
-        "--ctx-size",
-        type=int,
-        default=8192,
-        help="Context window size (default: 8192, use 16384+ for larger files)"
+        "--compress",
+        action="store_true",
+        help=f"Gzip request bodies of {COMPRESS_MIN_BYTES} bytes or more "
+             "(for a remote Ollama behind a proxy that accepts them)"
     )
     
     args = parser.parse_args()
     
-    # Load custom prompt if provided
-    custom_prompt = None
-    if args.prompt_file:
-        if args.prompt_file.exists():
-            custom_prompt = args.prompt_file.read_text()
-        else:
-            print(f"Warning: Prompt file not found: {args.prompt_file}")
+    stream, custom_prompt = apply_common_arguments(args)
+    # Concurrent async reviews would interleave streamed output
+    if args.use_async:
+        stream = False
+    _settings["compress"] = args.compress
+    _settings["semantic"] = args.semantic_cache
     
     output_format = "json" if args.json else "text"
     
     if args.path.is_file():
-        result = review_file(args.path, args.model, custom_prompt, args.ctx_size)
-        print_review(result, output_format)
+        backend = OllamaBackend(args.model, custom_prompt, args.ctx_size, args.concurrency)
+        print_review(backend.review_file(args.path, stream), output_format, stream)
     elif args.path.is_dir():
-        results = review_directory(
-            args.path,
-            args.extensions,
-            args.model,
-            args.recursive,
-            custom_prompt,
-            args.ctx_size
-        )
-        for result in results:
-            print_review(result, output_format)
-        
-        if not args.json:
-            print(f"\n✅ Reviewed {len(results)} file(s)")
+        if args.use_async:
+            results = asyncio.run(areview_directory(
+                args.path,
+                args.extensions,
+                args.model,
+                args.recursive,
+                custom_prompt,
+                args.ctx_size,
+                args.concurrency,
+                args.prefilter
+            ))
+        else:
+            results = review_directory(
+                args.path,
+                args.extensions,
+                args.model,
+                args.recursive,
+                custom_prompt,
+                args.ctx_size,
+                args.concurrency,
+                stream,
+                args.prefilter
+            )
+        print_results(results, output_format, stream)
     else:
         print(f"Error: Path not found: {args.path}")
         sys.exit(1)
@@ -12,12 +12,26 @@ See README.md for full documentation.
 """
 
 import argparse
-import json
+import atexit
+import functools
 import os
 import sys
 from pathlib import Path
 from typing import Optional
 
+import review_cache
+from common import (
+    add_common_arguments,
+    apply_common_arguments,
+    detect_language,
+    echo,
+    fill_template,
+    find_files,
+    print_results,
+    print_review,
+    review_files,
+)
+
 try:
     import anthropic
 except ImportError:
@@ -25,6 +39,17 @@ except ImportError:
     sys.exit(1)
 
 DEFAULT_MODEL = "claude-sonnet-4-20250514"
+DEFAULT_CONCURRENCY = 4
+NO_RESPONSE = "No response received"
+
+# The SDK retries rate limits, overloaded and 5xx responses and connection
+# errors itself, with exponential backoff and jitter, honouring retry-after
+MAX_RETRIES = 2
+
+# Prompts estimated (at CHARS_PER_TOKEN characters per token) not to fit in
+# the context window with max_tokens to spare are refused before uploading
+CONTEXT_TOKENS = 200_000
+CHARS_PER_TOKEN = 4
 
 # Base review prompt - comprehensive code review template
 BASE_PROMPT = """You are an expert code reviewer. Analyze the following {language} code thoroughly.
@@ -87,38 +112,19 @@ Language: {language}
 
 Review:"""
 
-# File extension to language mapping
-EXTENSION_MAP = {
-    ".cs": "csharp",
-    ".py": "python",
-    ".js": "javascript",
-    ".ts": "typescript",
-    ".tsx": "typescript",
-    ".jsx": "javascript",
-    ".java": "java",
-    ".go": "go",
-    ".rs": "rust",
-    ".cpp": "cpp",
-    ".c": "c",
-    ".rb": "ruby",
-    ".php": "php",
-    ".swift": "swift",
-    ".kt": "kotlin",
-}
-
 
+@functools.lru_cache(maxsize=None)
 def get_prompts_dir() -> Path:
     """Get the prompts directory path."""
     return Path(__file__).parent / "prompts"
 
 
-def detect_language(filepath: Path) -> str:
-    """Detect programming language from file extension."""
-    return EXTENSION_MAP.get(filepath.suffix.lower(), "unknown")
-
-
+@functools.lru_cache(maxsize=32)
 def load_language_prompt(language: str) -> Optional[str]:
-    """Load language-specific prompt from prompts directory if available."""
+    """Load language-specific prompt from prompts directory if available.
+
+    Cached, since every file of a language uses the same template.
+    """
     prompt_file = get_prompts_dir() / f"{language}.txt"
     
     if prompt_file.exists():
@@ -129,6 +135,27 @@ def load_language_prompt(language: str) -> Optional[str]:
     return None
 
 
+def select_prompt(language: str, custom_prompt: Optional[str] = None) -> str:
+    """Pick the template: custom_prompt > language-specific prompt > BASE_PROMPT."""
+    if custom_prompt:
+        return custom_prompt
+    return load_language_prompt(language) or BASE_PROMPT
+
+
+@functools.lru_cache(maxsize=32)
+def split_prompt(prompt: str) -> tuple[str, str]:
+    """Split a prompt template into its static rubric and per-file part.
+
+    The per-file part starts at the first line mentioning {filename} or
+    {code}; everything above it is identical for every file of a language.
+    """
+    positions = [pos for pos in (prompt.find("{filename}"), prompt.find("{code}")) if pos != -1]
+    if not positions:
+        return prompt, ""
+    start = prompt.rfind("\n", 0, min(positions)) + 1
+    return prompt[:start], prompt[start:]
+
+
 def review_code(
     code: str,
     filename: str,
@@ -136,43 +163,107 @@ def review_code(
     model: str = DEFAULT_MODEL,
     custom_prompt: Optional[str] = None,
     max_tokens: int = 4096,
-    api_key: Optional[str] = None
+    api_key: Optional[str] = None,
+    cache_key: Optional[str] = None,
+    stream: bool = False
 ) -> str:
-    """Send code to Claude for review."""
+    """Send code to Claude for review, unless a cached review exists.
+
+    Code estimated too large for the context window is refused with an
+    "ERROR: ..." review instead of being uploaded. With ``stream``, the
+    returned review has also been printed, as it was generated where
+    possible.
+    """
+    prompt = select_prompt(language, custom_prompt)
     
-    # Priority: custom_prompt > language-specific prompt > BASE_PROMPT
-    if custom_prompt:
-        prompt = custom_prompt
-    else:
-        prompt = load_language_prompt(language) or BASE_PROMPT
+    # The rubric goes in its own block marked for prompt caching, so files
+    # after the first are billed and processed at the cached rate. The code
+    # goes in a block of its own rather than being copied into the template
+    rubric_template, per_file_template = split_prompt(prompt)
+    rubric = rubric_template.format(filename=filename, language=language, code=code)
+    per_file = fill_template(per_file_template, filename, language, code)
+    # The API rejects whitespace-only text blocks, so such code (or template
+    # text) is kept joined with its neighbours
+    if not all(part.strip() for part in per_file):
+        per_file = ["".join(per_file)]
     
-    full_prompt = prompt.format(
-        filename=filename,
-        language=language,
-        code=code
+    content = []
+    if rubric.strip():
+        content.append({"type": "text", "text": rubric, "cache_control": {"type": "ephemeral"}})
+    content.extend({"type": "text", "text": part} for part in per_file if part.strip())
+    
+    cache_key = cache_key or review_cache.cache_key(
+        backend="anthropic", model=model, prompt=rubric + "".join(per_file),
+        max_tokens=max_tokens, temperature=0.3
     )
+    cached = review_cache.get(cache_key)
+    if cached is not None:
+        if stream:
+            echo(cached + "\n")
+        return cached
     
+    estimate = sum(len(block["text"]) for block in content) // CHARS_PER_TOKEN
+    if estimate + max_tokens > CONTEXT_TOKENS:
+        review = (
+            f"ERROR: File too large: ~{estimate} tokens plus {max_tokens} to generate "
+            f"exceeds the {CONTEXT_TOKENS}-token context window"
+        )
+    else:
+        review = _request_review(model, max_tokens, content, api_key, stream)
+    if review.startswith("ERROR:") or review == NO_RESPONSE:
+        if stream:
+            echo(review + "\n")
+        return review
+    review_cache.put(cache_key, review)
+    return review
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str) -> "anthropic.Anthropic":
+    """One client per API key, so its pooled connections are reused across files."""
+    client = anthropic.Anthropic(api_key=api_key, max_retries=MAX_RETRIES)
+    atexit.register(client.close)
+    return client
+
+
+def _request_review(
+    model: str,
+    max_tokens: int,
+    content: list[dict],
+    api_key: Optional[str],
+    stream: bool
+) -> str:
+    """Call the Messages API, streaming the text to stdout with ``stream``."""
     # Get API key from parameter, environment, or raise error
     key = api_key or os.environ.get("ANTHROPIC_API_KEY")
     if not key:
         return "ERROR: ANTHROPIC_API_KEY not set. Set it via environment variable or --api-key flag."
     
+    request = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "messages": [
+            {"role": "user", "content": content}
+        ],
+        "temperature": 0.3,  # Lower for more focused responses
+    }
+    
     try:
-        client = anthropic.Anthropic(api_key=key)
+        client = _get_client(key)
         
-        message = client.messages.create(
-            model=model,
-            max_tokens=max_tokens,
-            messages=[
-                {"role": "user", "content": full_prompt}
-            ],
-            temperature=0.3,  # Lower for more focused responses
-        )
+        if stream:
+            with client.messages.stream(**request) as response:
+                for text in response.text_stream:
+                    echo(text)
+                message = response.get_final_message()
+            echo("\n")
+        else:
+            message = client.messages.create(**request)
         
         # Extract text from response
         if message.content and len(message.content) > 0:
             return message.content[0].text
-        return "No response received"
+        return NO_RESPONSE
         
     except anthropic.AuthenticationError:
         return "ERROR: Invalid API key. Check your ANTHROPIC_API_KEY."
@@ -189,22 +280,42 @@ def review_file(
     model: str,
     custom_prompt: Optional[str] = None,
     max_tokens: int = 4096,
-    api_key: Optional[str] = None
+    api_key: Optional[str] = None,
+    stream: bool = False
 ) -> dict:
-    """Review a single file."""
+    """Review a single file, printing the review as it arrives with ``stream``."""
     if not filepath.exists():
         return {"file": str(filepath), "error": "File not found"}
     
     if not filepath.is_file():
         return {"file": str(filepath), "error": "Not a file"}
     
+    language = detect_language(filepath)
+    
+    # Hash the file before reading it, so a cache hit never loads it
     try:
+        cache_key = review_cache.file_key(
+            filepath,
+            backend="anthropic",
+            model=model,
+            prompt=select_prompt(language, custom_prompt),
+            filename=filepath.name,
+            language=language,
+            max_tokens=max_tokens,
+            temperature=0.3
+        )
+        cached = review_cache.get(cache_key)
+        if cached is not None:
+            if stream:
+                # Name the file before its cached review, as "Reviewing" would
+                print(f"📝 Cached review: {filepath.name} ({language})")
+                echo(cached + "\n")
+            return {"file": str(filepath), "language": language, "review": cached}
+        
         code = filepath.read_text(encoding="utf-8")
     except Exception as e:
         return {"file": str(filepath), "error": f"Cannot read file: {e}"}
     
-    language = detect_language(filepath)
-    
     print(f"📝 Reviewing: {filepath.name} ({language})...")
     
     review = review_code(
@@ -214,7 +325,9 @@ def review_file(
         model=model,
         custom_prompt=custom_prompt,
         max_tokens=max_tokens,
-        api_key=api_key
+        api_key=api_key,
+        cache_key=cache_key,
+        stream=stream
     )
     
     return {
@@ -224,6 +337,27 @@ def review_file(
     }
 
 
+class ClaudeBackend:
+    """The Claude reviewer as a common.Backend."""
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        custom_prompt: Optional[str] = None,
+        max_tokens: int = 4096,
+        api_key: Optional[str] = None
+    ):
+        self.model = model
+        self.custom_prompt = custom_prompt
+        self.max_tokens = max_tokens
+        self.api_key = api_key
+
+    def review_file(self, filepath: Path, stream: bool = False) -> dict:
+        return review_file(
+            filepath, self.model, self.custom_prompt, self.max_tokens, self.api_key, stream
+        )
+
+
 def review_directory(
     dirpath: Path,
     extensions: list[str],
@@ -231,39 +365,13 @@ def review_directory(
     recursive: bool = False,
     custom_prompt: Optional[str] = None,
     max_tokens: int = 4096,
-    api_key: Optional[str] = None
+    api_key: Optional[str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    stream: bool = False
 ) -> list[dict]:
-    """Review all matching files in a directory."""
-    results = []
-    
-    pattern = "**/*" if recursive else "*"
-    
-    for ext in extensions:
-        for filepath in dirpath.glob(f"{pattern}{ext}"):
-            if filepath.is_file():
-                result = review_file(filepath, model, custom_prompt, max_tokens, api_key)
-                results.append(result)
-    
-    return results
-
-
-def print_review(result: dict, output_format: str = "text"):
-    """Print review result."""
-    if output_format == "json":
-        print(json.dumps(result, indent=2))
-        return
-    
-    print("\n" + "=" * 60)
-    print(f"📄 File: {result['file']}")
-    
-    if "error" in result:
-        print(f"❌ Error: {result['error']}")
-    else:
-        print(f"🔤 Language: {result.get('language', 'unknown')}")
-        print("-" * 60)
-        print(result.get("review", "No review generated"))
-    
-    print("=" * 60)
+    """Review all matching files in a directory (see common.review_files)."""
+    backend = ClaudeBackend(model, custom_prompt, max_tokens, api_key)
+    return review_files(backend, find_files(dirpath, extensions, recursive), concurrency, stream)
 
 
 def main():
@@ -283,41 +391,8 @@ Environment:
         """
     )
     
-    parser.add_argument(
-        "path",
-        type=Path,
-        help="File or directory to review"
-    )
-    
-    parser.add_argument(
-        "-e", "--extensions",
-        nargs="+",
-        default=[".cs", ".py", ".ts", ".js"],
-        help="File extensions to review (default: .cs .py .ts .js)"
-    )
-    
-    parser.add_argument(
-        "-r", "--recursive",
-        action="store_true",
-        help="Review files recursively in directories"
-    )
-    
-    parser.add_argument(
-        "-m", "--model",
-        default=DEFAULT_MODEL,
-        help=f"Claude model to use (default: {DEFAULT_MODEL})"
-    )
-    
-    parser.add_argument(
-        "--json",
-        action="store_true",
-        help="Output results as JSON"
-    )
-    
-    parser.add_argument(
-        "--prompt-file",
-        type=Path,
-        help="Custom prompt template file"
+    add_common_arguments(
+        parser, DEFAULT_MODEL, "Claude", DEFAULT_CONCURRENCY, "lower it if you hit rate limits"
     )
     
     parser.add_argument(
@@ -334,35 +409,17 @@ Environment:
     )
     
     args = parser.parse_args()
-    
-    # Load custom prompt if provided
-    custom_prompt = None
-    if args.prompt_file:
-        if args.prompt_file.exists():
-            custom_prompt = args.prompt_file.read_text()
-        else:
-            print(f"Warning: Prompt file not found: {args.prompt_file}")
+    stream, custom_prompt = apply_common_arguments(args)
     
     output_format = "json" if args.json else "text"
+    backend = ClaudeBackend(args.model, custom_prompt, args.max_tokens, args.api_key)
     
     if args.path.is_file():
-        result = review_file(args.path, args.model, custom_prompt, args.max_tokens, args.api_key)
-        print_review(result, output_format)
+        print_review(backend.review_file(args.path, stream), output_format, stream)
     elif args.path.is_dir():
-        results = review_directory(
-            args.path,
-            args.extensions,
-            args.model,
-            args.recursive,
-            custom_prompt,
-            args.max_tokens,
-            args.api_key
-        )
-        for result in results:
-            print_review(result, output_format)
-        
-        if not args.json:
-            print(f"\n✅ Reviewed {len(results)} file(s)")
+        filepaths = find_files(args.path, args.extensions, args.recursive)
+        results = review_files(backend, filepaths, args.concurrency, stream)
+        print_results(results, output_format, stream)
     else:
         print(f"Error: Path not found: {args.path}")
         sys.exit(1)